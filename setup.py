@@ -11,6 +11,9 @@ setup(
     packages=find_packages(where="src"),
     package_dir={"": "src"},  # Explicitly define package location
     install_requires=[],
+    extras_require={
+        "fast": ["blake3", "xxhash", "orjson"],  # Optional faster hashing and JSON handling
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
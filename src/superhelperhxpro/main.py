@@ -1,16 +1,77 @@
 import argparse
+import atexit
 import json
 import os
-import shutil
 import collections
+import functools
+import errno
 import time
 import re
-import hashlib
 from datetime import datetime, timedelta
-import subprocess
+import sys
+# shutil, hashlib, mmap, subprocess, threading, queue and concurrent.futures, and the optional
+# blake3 and xxhash packages, are imported by the functions that use them, so commands that
+# don't need them start faster.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- Constants for Metadata ---
 METADATA_FILE = ".superhxpro_metadata.json"
+# Metadata files with more entries than this are written as compact JSON: nobody reads them by hand,
+# and every update rewrites the whole file, so the indentation is pure extra I/O (~25% of the file)
+METADATA_COMPACT_ENTRIES = 1000
+
+# Parsed metadata files by path: {metadata_path: ((st_mtime_ns, st_size), metadata)}
+_metadata_cache = {}
+# Metadata paths saved but not yet written; their cached dict is the current metadata (see _flush_metadata)
+_metadata_dirty = set()
+
+# --- Hashing ---
+# Deduplication is not security-sensitive, so the fast non-cryptographic/tree hashes
+# are preferred when their optional packages are installed.
+HASH_ALGORITHMS = ("blake3", "xxhash", "sha256")
+DEFAULT_HASH_ALGO = "blake3"
+HEAD_HASH_SIZE = 4096 # Bytes compared before hashing a whole file in deduplicate
+SMALL_FILE_SIZE = 128 * 1024 # get_file_hash reads files below this size in one call
+MMAP_FILE_SIZE = 8 * 1024 * 1024 # ...and memory-maps files above this size
+PREFETCH_WINDOW = 64 # Files whose reads are queued with the kernel ahead of the one being hashed
+PREFETCH_SIZE = 2 * 1024 * 1024 # Bytes queued per file, bounding page cache use to ~128 MiB
+# Per-file metadata fields holding deduplicate's cached hash, which export-map leaves out
+HASH_CACHE_FIELDS = ("hash", "hash_algo", "hash_size", "hash_mtime_ns", "hash_ctime_ns", "hash_ino")
+
+# --- Caching ---
+# Results cached by mtime (deduplicate's hashes, search-tag's index) aren't saved for files modified
+# more recently than this, since a second write within the same mtime tick couldn't be told apart
+MTIME_CACHE_MIN_AGE_NS = 2 * 10**9
+
+# --- Output ---
+OUTPUT_BATCH_LINES = 1024 # Per-file output lines written to stdout at once
+
+# --- Parallel folder walks ---
+SCAN_WORKERS = min(32, 4 * (os.cpu_count() or 1)) # Subtrees walked at once by _scan_parallel
+SCAN_QUEUE_SIZE = 256 # Folder results a subtree worker may get ahead of the one being printed
+
+# --- Copying ---
+COPY_WORKERS = min(32, 4 * (os.cpu_count() or 1)) # Files copied at once by deep_clone
+COPY_CHUNK_SIZE = 1024 * 1024 * 1024 # Bytes asked for per os.copy_file_range call
+FICLONE = 0x40049409 # ioctl from <linux/fs.h> that makes a copy-on-write clone (Btrfs, XFS, ...)
+
+# --- Per-user data ---
+USER_DATA_DIR = os.path.join(os.path.expanduser("~"), ".superhelperxpro")
+TAG_INDEX_DIR = os.path.join(USER_DATA_DIR, "tag_index") # search-tag's cached tags, one file per searched folder
+TAG_INDEX_MAX_FILES = 32 # Index files kept; the least recently used are deleted beyond this
+
+# --- Scheduling ---
+SCHEDULE_FILE = os.path.join(USER_DATA_DIR, "schedule.json") # Pending jobs and the scheduler daemon's pid
+SCHEDULE_LOCK_FILE = os.path.join(USER_DATA_DIR, "schedule.lock")
+SCHEDULE_DAEMON_LOCK_FILE = os.path.join(USER_DATA_DIR, "schedule.daemon.lock") # Held by the daemon while it runs
+SCHEDULE_LOG_FILE = os.path.join(USER_DATA_DIR, "schedule.log") # Output of the scheduled commands
+
+# unlink/rename relative to an open folder (unlinkat/renameat), on platforms that have them
+_DIR_FD_SUPPORTED = os.unlink in os.supports_dir_fd and os.rename in os.supports_dir_fd and os.stat in os.supports_dir_fd
 
 # --- Helper Functions ---
 
@@ -24,20 +85,63 @@ def _normalize_path(path):
     return os.path.abspath(path)
 
 
+def _json_loads(content):
+    """Parses JSON with orjson when it's installed, else the standard json module."""
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # orjson rejects the escaped lone surrogates _json_dumps writes for non-UTF-8 filenames;
+            # truly malformed JSON fails again below with json.JSONDecodeError, which orjson's subclasses
+            pass
+    return json.loads(content)
+
+def _json_dumps(data, indent=True):
+    """
+    Serializes 'data' to JSON bytes, indented or compact, with orjson when it's installed.
+    Both paths produce the same layout, so files don't change format with the environment.
+    Data orjson can't encode, such as filenames that aren't valid UTF-8 (which Python holds as
+    surrogate escapes on Linux), goes through the json module, whose ASCII output escapes them.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2) if indent else orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            pass
+    if indent:
+        return json.dumps(data, indent=2).encode('ascii')
+    return json.dumps(data, separators=(",", ":")).encode('ascii')
+
+
 def _load_metadata(folder_path):
     """
     Loads metadata from a hidden JSON file in the specified folder.
     Returns an empty dictionary if the file doesn't exist, is empty, or is corrupted.
+    Parsed files are cached until the file's mtime/size change, so the returned dict is shared:
+    callers that modify it must persist the change with _save_metadata.
     """
     normalized_folder_path = _normalize_path(folder_path)
     metadata_path = os.path.join(normalized_folder_path, METADATA_FILE)
+
+    # Saved in this run but not written yet: the file on disk is out of date
+    if metadata_path in _metadata_dirty:
+        return _metadata_cache[metadata_path][1]
     
     # If the metadata file doesn't exist, there's no metadata to load.
-    if not os.path.exists(metadata_path):
+    try:
+        stat = os.stat(metadata_path)
+    except OSError:
+        _metadata_cache.pop(metadata_path, None)
         return {}
 
+    cache_key = (stat.st_mtime_ns, stat.st_size)
+    cached = _metadata_cache.get(metadata_path)
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+
     try:
-        with open(metadata_path, 'r', encoding='utf-8') as f:
+        # Read as bytes: both JSON backends parse UTF-8 bytes directly, without decoding to str first
+        with open(metadata_path, 'rb') as f:
             content = f.read().strip() # Read content and remove leading/trailing whitespace
             
             # If the file is empty after stripping whitespace, treat it as if no metadata exists.
@@ -46,12 +150,15 @@ def _load_metadata(folder_path):
                 return {} 
             
             # Attempt to parse the content as JSON.
-            return json.loads(content) 
+            metadata = _json_loads(content)
+            _metadata_cache[metadata_path] = (cache_key, metadata)
+            return metadata
             
     except json.JSONDecodeError:
         # Catch JSON parsing errors (e.g., malformed JSON).
         print(f"[ERROR] Metadata file '{metadata_path}' is corrupted or malformed. Returning empty dict and attempting to back up/reset.")
         try:
+            import shutil
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
             shutil.copy2(metadata_path, f"{metadata_path}.corrupted_{timestamp}.bak")
             print(f"[INFO] Backed up corrupted metadata file to '{metadata_path}.corrupted_{timestamp}.bak'")
@@ -70,13 +177,39 @@ def _load_metadata(folder_path):
 def _save_metadata(folder_path, metadata):
     """
     Saves metadata to a hidden JSON file in the specified folder.
-    Ensures the target directory exists before saving.
+    The file is written by _flush_metadata when the command finishes, so a folder saved many
+    times during a walk is only written once. Until then _load_metadata returns 'metadata'.
     IMPORTANT: Only saves the file if 'metadata' is not empty.
                Deletes the file if 'metadata' is empty and the file exists.
     """
     normalized_folder_path = _normalize_path(folder_path)
     metadata_path = os.path.join(normalized_folder_path, METADATA_FILE)
+    _metadata_cache[metadata_path] = (None, metadata)
+    _metadata_dirty.add(metadata_path)
 
+def _flush_metadata():
+    """
+    Writes out every metadata file saved with _save_metadata since the last flush.
+    main() calls it once the command is done, and it's registered with atexit for other callers.
+    Returns the folders whose changes couldn't be written, after naming them in an error message.
+    """
+    failed_folders = []
+    for metadata_path in sorted(_metadata_dirty):
+        metadata = _metadata_cache.pop(metadata_path)[1] # The file is about to change; next load re-reads it
+        _metadata_dirty.discard(metadata_path)
+        if not _write_metadata_file(metadata_path, metadata):
+            failed_folders.append(os.path.dirname(metadata_path))
+    if failed_folders:
+        print(f"Error: Metadata changes for {len(failed_folders)} folder(s) were not saved: {', '.join(failed_folders)}")
+    return failed_folders
+
+atexit.register(_flush_metadata)
+
+def _write_metadata_file(metadata_path, metadata):
+    """
+    Writes 'metadata' to 'metadata_path', or deletes the file if 'metadata' is empty.
+    Ensures the target directory exists before saving. Returns False if that failed.
+    """
     if not metadata: # Check if the dictionary is empty (e.g., {})
         if os.path.exists(metadata_path): # If it's empty, and the file exists, delete it
             try:
@@ -84,22 +217,64 @@ def _save_metadata(folder_path, metadata):
                 print(f"[INFO] Deleted empty metadata file: '{metadata_path}'.")
             except OSError as e:
                 print(f"[ERROR] Failed to delete empty metadata file '{metadata_path}': {e}")
-        return # In either case (empty metadata, no file, or just deleted file), we're done.
+                return False
+        return True # In either case (empty metadata, no file, or just deleted file), we're done.
 
     # If metadata is NOT empty, proceed to save it
     try:
-        os.makedirs(normalized_folder_path, exist_ok=True) # Use normalized path here
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=4)
+        os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+        # Write a temporary file next to it and swap it in with one atomic rename,
+        # so an interrupted save never leaves a truncated metadata file behind.
+        temp_path = f"{metadata_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(_json_dumps(metadata, indent=len(metadata) <= METADATA_COMPACT_ENTRIES))
+            os.replace(temp_path, metadata_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
         # print(f"[INFO] Metadata successfully saved to '{metadata_path}'.") 
+        return True
     except PermissionError:
         print(f"Error: Permission denied. Cannot save metadata to '{metadata_path}'.")
     except IOError as e:
         print(f"Error saving metadata to '{metadata_path}': {e}")
     except Exception as e:
         print(f"An unexpected error occurred while saving metadata to '{metadata_path}': {e}")
+    return False
 
-def folder_mood_get(folder, recursive=False, mood_filter_name=None):
+class _LineBuffer:
+    """
+    Collects per-file output lines and writes them to stdout OUTPUT_BATCH_LINES at a time,
+    instead of one print (and one flush, on a terminal) per line.
+    With quiet=True the lines are dropped, so only a command's totals are printed.
+    Call flush() before printing anything else, to keep the output in order.
+    """
+
+    def __init__(self, quiet=False):
+        self._quiet = quiet
+        self._lines = []
+
+    def add(self, line):
+        if self._quiet:
+            return
+        self._lines.append(line)
+        if len(self._lines) >= OUTPUT_BATCH_LINES:
+            self.flush()
+
+    def extend(self, lines):
+        for line in lines:
+            self.add(line)
+
+    def flush(self):
+        if self._lines:
+            sys.stdout.write("\n".join(self._lines) + "\n")
+            self._lines.clear()
+
+def folder_mood_get(folder, recursive=False, mood_filter_name=None, quiet=False):
     """
     Gets the emotional label for a specific folder, or recursively scans folders
     to find those matching a specified mood name.
@@ -120,19 +295,18 @@ def folder_mood_get(folder, recursive=False, mood_filter_name=None):
         return
 
     # Handle recursive or filtered scan
-    found_matches = False
-
-    for root, dirs, files in os.walk(folder):
+    found_matches = 0
+    out = _LineBuffer(quiet)
+    # Case-folded once here; a substring test on each case-folded mood is several times faster
+    # than an IGNORECASE regex search, which can't use the fast literal search
+    filter_needle = mood_filter_name.casefold() if mood_filter_name else None
+
+    def check_folder(root, dir_entries, file_entries):
+        # Runs on a worker thread; returns the output line if the folder's mood matches, else None
         current_folder_path = root
 
-        # Filter out the metadata file itself from traversal if it's treated as a file by os.walk (though it shouldn't be)
-        if METADATA_FILE in files:
-            files.remove(METADATA_FILE) 
-        
         # Filter out the metadata file from subdirectories if it somehow gets listed as one
-        # This is primarily for robust `os.walk` behavior, less common for actual dirs.
-        if METADATA_FILE.strip('.') in dirs:
-            dirs.remove(METADATA_FILE.strip('.'))
+        dir_entries[:] = [d for d in dir_entries if d.name != METADATA_FILE.strip('.')]
 
 
         try:
@@ -144,57 +318,383 @@ def folder_mood_get(folder, recursive=False, mood_filter_name=None):
                 mood_value = mood_info.get("value", "N/A")
                 mood_name = mood_info.get("name", "N/A")
 
-                filter_lower = mood_filter_name.lower() if mood_filter_name else None
-
-                if filter_lower is None or \
-                   (mood_value and filter_lower in mood_value.lower()) or \
-                   (mood_name and filter_lower in mood_name.lower()):
-                    print(f"{current_folder_path} - {mood_value}")
-                    found_matches = True
+                if filter_needle is None or \
+                   (mood_value and filter_needle in mood_value.casefold()) or \
+                   (mood_name and filter_needle in mood_name.casefold()):
+                    return f"{current_folder_path} - {mood_value}"
 
         except Exception as e:
             # print(f"Warning: Error processing metadata for '{current_folder_path}': {e}") 
             pass # Suppress errors for clean output
+        return None
 
+    # Folders are checked on a thread pool, one subtree per worker, and reported in walk order
+    for line in _scan_parallel(folder, check_folder):
+        if line is not None:
+            out.add(line)
+            found_matches += 1
+
+    out.flush()
     if not found_matches:
         print("No matching moods found for the specified criteria.")
+    elif quiet:
+        print(f"Found {found_matches} folder(s) with matching moods.")
+
 
+def _get_hasher_factory(algo_name):
+    """
+    Returns a constructor for the requested hash algorithm.
+    Falls back to SHA256 if the optional package for 'blake3' or 'xxhash' isn't installed.
+    """
+    if algo_name == "blake3":
+        try:
+            import blake3
+            return blake3.blake3
+        except ImportError:
+            pass
+    elif algo_name == "xxhash":
+        try:
+            import xxhash
+            return xxhash.xxh3_64
+        except ImportError:
+            pass
+    elif algo_name not in HASH_ALGORITHMS:
+        print(f"Warning: Unknown hash algorithm '{algo_name}'. Using sha256.")
+    import hashlib
+    return hashlib.sha256
+
+def get_file_hash(filepath, hash_algo=None, chunk_size=1024 * 1024):
+    """
+    Calculates the hash of a file.
+    'hash_algo' is a hasher constructor (see _get_hasher_factory); SHA256 by default.
+    Small files are read in a single call, large files are hashed straight from a read-only
+    memory map (no copies into Python buffers), and the rest are streamed in 'chunk_size' blocks
+    through one reused buffer, as hashlib.file_digest does.
+    BLAKE3 hashes large files on all cores; its tree structure lets one file be split across threads.
+    """
+    import mmap
+    if hash_algo is None:
+        import hashlib
+        hash_algo = hashlib.sha256
+    hasher = hash_algo()
+    try:
+        with open(filepath, 'rb', buffering=0) as f:
+            fd = f.fileno()
+            size = os.fstat(fd).st_size
+            if size < SMALL_FILE_SIZE:
+                hasher.update(f.read())
+            elif size > MMAP_FILE_SIZE and hasattr(hasher, "update_mmap"): # blake3 >= 0.3
+                hasher = hash_algo(max_threads=hash_algo.AUTO)
+                hasher.update_mmap(filepath)
+            elif size > MMAP_FILE_SIZE:
+                with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                    if hasattr(mapped, "madvise"): # Python 3.8+, not on Windows
+                        mapped.madvise(mmap.MADV_SEQUENTIAL)
+                        if hasattr(mmap, "MADV_HUGEPAGE"):
+                            try:
+                                mapped.madvise(mmap.MADV_HUGEPAGE)
+                            except OSError:
+                                pass # Not supported for file mappings on every kernel/filesystem
+                    hasher.update(mapped)
+            else:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                # readinto a single buffer instead of allocating a new bytes object per chunk
+                buffer = bytearray(chunk_size)
+                view = memoryview(buffer)
+                while read_size := f.readinto(buffer):
+                    hasher.update(view[:read_size])
+        return hasher.hexdigest()
+    except (IOError, ValueError) as e: # ValueError: file emptied before it could be mapped
+        print(f"Error reading file '{filepath}' for hashing: {e}")
+        return None
 
-def get_file_hash(filepath, hash_algo=hashlib.sha256, chunk_size=65536):
-    """Calculates the SHA256 hash of a file."""
+def _get_head_hash(filepath, hash_algo=None, head_size=HEAD_HASH_SIZE):
+    """
+    Hashes only the first 'head_size' bytes of a file.
+    Used by deduplicate as a cheap filter before hashing whole files.
+    """
+    if hash_algo is None:
+        import hashlib
+        hash_algo = hashlib.sha256
     hasher = hash_algo()
     try:
         with open(filepath, 'rb') as f:
-            while chunk := f.read(chunk_size):
-                hasher.update(chunk)
+            hasher.update(f.read(head_size))
         return hasher.hexdigest()
     except IOError as e:
         print(f"Error reading file '{filepath}' for hashing: {e}")
         return None
 
-def _is_file_older_than(filepath, days):
-    """Checks if a file is older than a given number of days."""
+def _prefetch_files(filepaths, length):
+    """
+    Asks the kernel to start reading the first 'length' bytes of each file into the page cache
+    in the background (posix_fadvise WILLNEED), so many reads are in flight at once instead of
+    one blocking read per file. No-op where posix_fadvise isn't available (e.g. Windows, macOS).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for filepath in filepaths:
+        try:
+            fd = os.open(filepath, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+def _hash_files(filepaths, hash_func, prefetch_length):
+    """
+    Returns {filepath: hash_func(filepath)}, hashing on a thread pool (hashlib and blake3 release
+    the GIL while hashing). Files are started in the given order, so callers list the largest first
+    to keep one big file from finishing last. Each task also queues the file PREFETCH_WINDOW
+    positions ahead for reading, keeping that many reads in flight.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def hash_one(i):
+        _prefetch_files(filepaths[i + PREFETCH_WINDOW:i + PREFETCH_WINDOW + 1], prefetch_length)
+        return hash_func(filepaths[i])
+
+    _prefetch_files(filepaths[:PREFETCH_WINDOW], prefetch_length)
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        return dict(zip(filepaths, executor.map(hash_one, range(len(filepaths)))))
+
+def _age_cutoff(days):
+    """
+    Returns the timestamp a file's st_mtime must be below to be older than 'days' days.
+    Worked out once per command, so each file costs one comparison instead of two datetimes.
+    """
+    return time.time() - days * 86400
+
+def _scan(folder, recursive=True):
+    """
+    Walks a folder like os.walk, but yields (root, dir_entries, file_entries) lists of os.DirEntry.
+    DirEntry caches is_dir()/is_file() from the directory listing itself, so callers don't need
+    an extra os.path.isdir/os.path.isfile/os.stat call per entry.
+    As with os.walk, symlinked folders are listed but not descended into, unreadable folders are
+    skipped, and callers may prune 'dir_entries' in place to skip subfolders.
+    """
+    pending_dirs = [folder]
+    while pending_dirs:
+        root = pending_dirs.pop()
+        dir_entries = []
+        file_entries = []
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dir_entries.append(entry)
+                    else:
+                        file_entries.append(entry)
+        except OSError:
+            continue
+
+        yield root, dir_entries, file_entries
+
+        if recursive:
+            # Pushed in reverse so subfolders are visited in listing order, like os.walk
+            pending_dirs.extend(entry.path for entry in reversed(dir_entries) if not entry.is_symlink())
+
+def _open_dir_fd(folder):
+    """
+    Opens a folder for os calls with dir_fd, so work on many of its files resolves each name
+    inside the open folder instead of walking the full path again every time.
+    Returns None where dir_fd isn't supported or the folder can't be opened.
+    """
+    if not _DIR_FD_SUPPORTED:
+        return None
     try:
-        stat = os.stat(filepath)
-        mod_time = datetime.fromtimestamp(stat.st_mtime)
-        return datetime.now() - mod_time > timedelta(days=days)
-    except OSError as e:
-        print(f"Error accessing file '{filepath}': {e}")
+        return os.open(folder, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+    except OSError:
+        return None
+
+def _path_in_dir(dir_fd, folder, name):
+    """Returns the path to pass along with dir_fd for 'name' in 'folder': the bare name if the folder is open."""
+    return name if dir_fd is not None else os.path.join(folder, name)
+
+def _scan_parallel(folder, process_folder):
+    """
+    Calls process_folder(root, dir_entries, file_entries) for every folder _scan(folder) would
+    yield, and yields the results in that same order. The top-level subfolders are each walked
+    on a thread pool (listing, stat and metadata reads release the GIL), so their latency
+    overlaps. process_folder runs on worker threads: it should return what needs printing
+    rather than print it. It may prune 'dir_entries' in place, like with _scan.
+    Each subtree's results are passed back through a bounded queue, so memory stays bounded
+    by SCAN_QUEUE_SIZE results per worker however large the tree is.
+    """
+    top = next(_scan(folder, recursive=False), None)
+    if top is None:
+        return
+    yield process_folder(*top)
+    subfolders = [entry.path for entry in top[1] if not entry.is_symlink()]
+    if not subfolders:
+        return
+
+    import queue
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    cancelled = threading.Event()
+    results = [queue.Queue(maxsize=SCAN_QUEUE_SIZE) for _ in subfolders]
+
+    def put(result_queue, item):
+        # Gives up once the consumer has stopped reading, so an abandoned walk can't hang the pool
+        while not cancelled.is_set():
+            try:
+                result_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
         return False
 
-def _get_file_size(filepath):
-    """Returns the size of a file in bytes."""
+    def walk_subtree(subfolder, result_queue):
+        try:
+            for walked in _scan(subfolder):
+                if not put(result_queue, (True, process_folder(*walked))):
+                    return
+        except BaseException as e:
+            put(result_queue, (False, e))
+            return
+        put(result_queue, (False, None))
+
+    # Subtrees start in order and results are read in order, so the subtree being read is always running
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        futures = [executor.submit(walk_subtree, subfolder, result_queue) for subfolder, result_queue in zip(subfolders, results)]
+        try:
+            for result_queue in results:
+                while True:
+                    is_result, item = result_queue.get()
+                    if is_result:
+                        yield item
+                    elif item is None:
+                        break
+                    else:
+                        raise item
+        finally:
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+
+def _copy_file_range(in_fd, out_fd):
+    """
+    Copies everything from in_fd's position to out_fd with os.copy_file_range, which copies in the
+    kernel and lets copy-on-write and network filesystems share or copy blocks server-side.
+    Returns False, having written nothing, if this filesystem pair doesn't support it.
+    """
+    try:
+        while os.copy_file_range(in_fd, out_fd, COPY_CHUNK_SIZE): # Returns 0 at end of file
+            pass
+    except OSError as e:
+        # Unsupported: old kernel, cross-filesystem before Linux 5.3, or a filesystem without it
+        if e.errno in (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP) and os.lseek(out_fd, 0, os.SEEK_CUR) == 0:
+            return False
+        raise
+    return True
+
+def _reflink(in_fd, out_fd):
+    """
+    Makes out_fd a copy-on-write clone of in_fd with the FICLONE ioctl, which shares the data
+    blocks instead of copying them. Returns False if the filesystem can't clone between these files.
+    """
+    import fcntl
     try:
-        return os.stat(filepath).st_size
+        fcntl.ioctl(out_fd, FICLONE, in_fd)
     except OSError as e:
-        print(f"Error accessing file '{filepath}': {e}")
-        return 0
+        # Not a reflink filesystem, different filesystems, or an ioctl this kernel doesn't know
+        if e.errno in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EBADF):
+            return False
+        raise
+    return True
+
+def _fast_copy(src, dst):
+    """
+    Copies a file's contents and metadata like shutil.copy2. On Linux it tries a reflink clone
+    first, then os.copy_file_range, before falling back to shutil.copyfile (which itself uses
+    sendfile on Linux and fcopyfile on macOS).
+    """
+    import shutil
+    copied = False
+    if hasattr(os, "copy_file_range"):
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            copied = _reflink(fsrc.fileno(), fdst.fileno()) or _copy_file_range(fsrc.fileno(), fdst.fileno())
+    if not copied:
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+def _fast_copytree(src, dest):
+    """
+    Works like shutil.copytree(src, dest), but copies the files with _fast_copy on a thread pool
+    so many small files are copied at once. Raises shutil.Error listing every failed copy.
+    """
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+
+    errors = []
+    copies = []
+    copied_dirs = {} # {dest folder: src folder} for folders that had files written into them
+
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        def submit_copy(src_file, dest_file):
+            copied_dirs[os.path.dirname(dest_file)] = os.path.dirname(src_file)
+            copies.append((src_file, dest_file, executor.submit(_fast_copy, src_file, dest_file)))
+            return dest_file
+
+        try:
+            shutil.copytree(src, dest, copy_function=submit_copy)
+        except shutil.Error as e:
+            errors.extend(e.args[0])
+
+    for src_file, dest_file, future in copies:
+        try:
+            future.result()
+        except OSError as e:
+            errors.append((src_file, dest_file, str(e)))
+
+    # copytree copied each folder's timestamps before its files finished writing; copy them again
+    for dest_dir, src_dir in copied_dirs.items():
+        try:
+            shutil.copystat(src_dir, dest_dir)
+        except OSError as e:
+            errors.append((src_dir, dest_dir, str(e)))
+
+    if errors:
+        raise shutil.Error(errors)
 
 # --- Core SuperHelperXPro Commands ---
 
+def _push_tree_items(stack, folder, depth, prefix):
+    """
+    Lists 'folder' for visualize_folder and pushes its items onto 'stack' as
+    (entry, depth, prefix, is_last), in reverse so they pop in display order.
+    """
+    try:
+        # One scandir pass; DirEntry.is_dir() is answered from the listing, no extra stat per item
+        with os.scandir(folder) as entries:
+            # Filter out the metadata file itself from the listing
+            items = [entry for entry in entries if entry.name != METADATA_FILE]
+
+        # Sort items: directories first, then files, alphabetically
+        items.sort(key=lambda e: (not e.is_dir(), e.name.lower()))
+    except OSError as e:
+        print(f"Error accessing folder '{folder}': {e}")
+        return
+
+    last_index = len(items) - 1
+    for i in range(last_index, -1, -1):
+        stack.append((items[i], depth, prefix, i == last_index))
+
 def visualize_folder(folder, max_depth, current_depth=0, prefix=""):
     """
-    Recursively visualizes the folder structure.
+    Visualizes the folder structure down to 'max_depth' levels.
+    Walks with an explicit stack rather than recursion, so very deep trees can't hit the recursion limit.
     """
     if not os.path.isdir(folder):
         print(f"Error: Folder '{folder}' not found.")
@@ -203,27 +703,24 @@ def visualize_folder(folder, max_depth, current_depth=0, prefix=""):
     if current_depth > max_depth:
         return
 
-    try:
-        items = os.listdir(folder)
-        # Filter out the metadata file itself from the listing
-        items = [item for item in items if item != METADATA_FILE]
-        
-        # Sort items: directories first, then files, alphabetically
-        items.sort(key=lambda x: (not os.path.isdir(os.path.join(folder, x)), x.lower()))
-
-        for i, item in enumerate(items):
-            path = os.path.join(folder, item)
-            connector = "├── " if i < len(items) - 1 else "└── "
-            item_type = "(Dir)" if os.path.isdir(path) else "(File)"
-            print(f"{prefix}{connector}{item} {item_type}")
-
-            if os.path.isdir(path):
-                extension = "│   " if i < len(items) - 1 else "    "
-                visualize_folder(path, max_depth, current_depth + 1, prefix + extension)
-    except OSError as e:
-        print(f"Error accessing folder '{folder}': {e}")
-
-def batch_rename(folder, regex_pattern, replacement, recursive):
+    stack = []
+    _push_tree_items(stack, folder, current_depth, prefix)
+    while stack:
+        entry, depth, item_prefix, is_last = stack.pop()
+        connector = "└── " if is_last else "├── "
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        item_type = "(Dir)" if is_dir else "(File)"
+        print(f"{item_prefix}{connector}{entry.name} {item_type}")
+
+        # A folder's items are pushed right after it's printed, so they're shown before its next sibling
+        if is_dir and depth < max_depth:
+            extension = "    " if is_last else "│   "
+            _push_tree_items(stack, entry.path, depth + 1, item_prefix + extension)
+
+def batch_rename(folder, regex_pattern, replacement, recursive, quiet=False):
     """
     Renames many files at once using regex.
     """
@@ -234,32 +731,56 @@ def batch_rename(folder, regex_pattern, replacement, recursive):
     print(f"Starting batch rename in '{folder}' (recursive: {recursive})...")
     renamed_count = 0
 
-    for root, _, files in os.walk(folder):
-        if not recursive and root != folder:
-            continue
+    # Compile once instead of going through re's pattern cache for every file
+    try:
+        pattern = re.compile(regex_pattern)
+    except re.error as e:
+        print(f"Error with regex pattern '{regex_pattern}': {e}")
+        return
+    # A pattern with no regex metacharacters and a replacement with no escapes or group references
+    # is a plain substring replacement, which str.replace does much faster than re.sub.
+    is_literal = re.escape(regex_pattern) == regex_pattern and "\\" not in replacement
+    out = _LineBuffer(quiet)
 
+    for root, _, file_entries in _scan(folder, recursive):
         # Filter out the metadata file from processing
-        files_to_process = [f for f in files if f != METADATA_FILE]
+        files_to_process = [entry.name for entry in file_entries if entry.name != METADATA_FILE]
+        dir_fd = None
 
-        for filename in files_to_process:
-            try:
-                original_path = os.path.join(root, filename)
-                new_filename = re.sub(regex_pattern, replacement, filename)
-
-                if new_filename != filename:
-                    new_path = os.path.join(root, new_filename)
-                    if os.path.exists(new_path):
-                        print(f"  Skipping '{original_path}': Target '{new_path}' already exists.")
-                        continue
-                    os.rename(original_path, new_path)
-                    print(f"  Renamed: '{filename}' -> '{new_filename}'")
-                    renamed_count += 1
-            except re.error as e:
-                print(f"Error with regex pattern '{regex_pattern}': {e}")
-                return
-            except OSError as e:
-                print(f"Error renaming '{filename}': {e}")
+        try:
+            for filename in files_to_process:
+                try:
+                    original_path = os.path.join(root, filename)
+                    if is_literal:
+                        new_filename = filename.replace(regex_pattern, replacement)
+                    else:
+                        new_filename = pattern.sub(replacement, filename)
 
+                    if new_filename != filename:
+                        new_path = os.path.join(root, new_filename)
+                        if dir_fd is None:
+                            dir_fd = _open_dir_fd(root) # Opened on the first rename, then reused for the rest
+                        try:
+                            os.stat(_path_in_dir(dir_fd, root, new_filename), dir_fd=dir_fd)
+                            out.add(f"  Skipping '{original_path}': Target '{new_path}' already exists.")
+                            continue
+                        except FileNotFoundError:
+                            pass
+                        os.rename(_path_in_dir(dir_fd, root, filename), _path_in_dir(dir_fd, root, new_filename),
+                                  src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+                        out.add(f"  Renamed: '{filename}' -> '{new_filename}'")
+                        renamed_count += 1
+                except re.error as e:
+                    out.flush()
+                    print(f"Error with regex pattern '{regex_pattern}': {e}")
+                    return
+                except OSError as e:
+                    out.add(f"Error renaming '{filename}': {e}")
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+
+    out.flush()
     print(f"Finished. Total files renamed: {renamed_count}")
 
 def deep_clone(src, dest):
@@ -275,14 +796,14 @@ def deep_clone(src, dest):
 
     print(f"Deep cloning '{src}' to '{dest}'...")
     try:
-        shutil.copytree(src, dest)
+        _fast_copytree(src, dest)
         # After cloning, clean up any empty metadata files that might have been copied
-        for root, dirs, files in os.walk(dest):
+        for root, _, file_entries in _scan(dest):
             # Ensure proper folder path for _load_metadata for newly cloned directories
             normalized_root = _normalize_path(root)
             metadata_path = os.path.join(normalized_root, METADATA_FILE)
 
-            if os.path.exists(metadata_path):
+            if any(entry.name == METADATA_FILE for entry in file_entries):
                 metadata = _load_metadata(normalized_root)
                 if not metadata: # If the loaded metadata is empty, delete the file
                     try:
@@ -299,6 +820,8 @@ def conditional_move_copy(src, dest, condition_type, value, is_copy):
     """
     Moves or copies files based on rules (e.g., age, size).
     """
+    import shutil
+
     if not os.path.isdir(src):
         print(f"Error: Source folder '{src}' not found.")
         return
@@ -310,32 +833,52 @@ def conditional_move_copy(src, dest, condition_type, value, is_copy):
             return
 
     action = "copying" if is_copy else "moving"
+
+    # The condition and value are the same for every file, so check them and build the test once
+    condition = condition_type.lower()
+    if condition not in ("agedays", "sizegt", "sizelt"):
+        print(f"Warning: Unknown condition type '{condition_type}'. No files {'copied' if is_copy else 'moved'}.")
+        return
+    try:
+        threshold = int(value)
+    except ValueError:
+        print(f"Error: Invalid value '{value}' for condition type '{condition_type}'.")
+        return
+    if condition == "agedays":
+        cutoff = _age_cutoff(threshold)
+        matches = lambda stat: stat.st_mtime < cutoff
+    elif condition == "sizegt": # Size Greater Than (bytes)
+        matches = lambda stat: stat.st_size > threshold
+    else: # Size Less Than (bytes)
+        matches = lambda stat: stat.st_size < threshold
+
     print(f"{action.capitalize()} files from '{src}' to '{dest}' based on condition '{condition_type}' with value '{value}'...")
     processed_count = 0
 
-    for filename in os.listdir(src):
-        filepath = os.path.join(src, filename)
-        if not os.path.isfile(filepath) or filename == METADATA_FILE: # Skip metadata file
+    # Materialize the listing first, since files are moved out of 'src' while iterating
+    with os.scandir(src) as entries:
+        src_entries = list(entries)
+    # Ensure folder paths are normalized for _load_metadata and _save_metadata
+    normalized_src = _normalize_path(src)
+    normalized_dest = _normalize_path(dest)
+
+    for entry in src_entries:
+        filename = entry.name
+        filepath = entry.path
+        if filename == METADATA_FILE or not entry.is_file(): # Skip metadata file
             continue
 
-        perform_action = False
         try:
-            if condition_type.lower() == "agedays":
-                if _is_file_older_than(filepath, int(value)):
-                    perform_action = True
-            elif condition_type.lower() == "sizegt": # Size Greater Than (bytes)
-                if _get_file_size(filepath) > int(value):
-                    perform_action = True
-            elif condition_type.lower() == "sizelt": # Size Less Than (bytes)
-                if _get_file_size(filepath) < int(value):
-                    perform_action = True
-            else:
-                print(f"Warning: Unknown condition type '{condition_type}'. Skipping file '{filename}'.")
-                continue
+            perform_action = matches(entry.stat()) # Cached by the DirEntry where the OS allows
+        except OSError as e:
+            print(f"Error accessing file '{filepath}': {e}")
+            continue
 
+        try:
             if perform_action:
                 dest_path = os.path.join(dest, filename)
-                if os.path.exists(dest_path):
+                # Checked on the filesystem, which knows whether names are case-sensitive
+                if os.path.lexists(dest_path):
                     print(f"  Skipping '{filename}': Target '{dest_path}' already exists.")
                     continue
 
@@ -344,10 +887,6 @@ def conditional_move_copy(src, dest, condition_type, value, is_copy):
                     print(f"  Copied: '{filename}' to '{dest}'")
                 else:
                     # When moving, also consider moving/updating metadata if relevant
-                    # Ensure folder paths are normalized for _load_metadata and _save_metadata
-                    normalized_src = _normalize_path(src)
-                    normalized_dest = _normalize_path(dest)
-
                     src_metadata = _load_metadata(normalized_src)
                     dest_metadata = _load_metadata(normalized_dest)
                     
@@ -359,15 +898,12 @@ def conditional_move_copy(src, dest, condition_type, value, is_copy):
                     _save_metadata(normalized_dest, dest_metadata) # Save changes to dest metadata (might create/update)
                     print(f"  Moved: '{filename}' to '{dest}'")
                 processed_count += 1
-        except ValueError:
-            print(f"Error: Invalid value '{value}' for condition type '{condition_type}'.")
-            return
         except OSError as e:
             print(f"Error {action}ing file '{filename}': {e}")
 
     print(f"Finished. Total files {action}ed: {processed_count}")
 
-def auto_cleanup(folder, criteria, value):
+def auto_cleanup(folder, criteria, value, quiet=False):
     """
     Deletes old or unwanted files based on criteria.
     """
@@ -375,157 +911,336 @@ def auto_cleanup(folder, criteria, value):
         print(f"Error: Folder '{folder}' not found.")
         return
 
+    criteria_lower = criteria.lower()
+    if criteria_lower == "agedays":
+        try:
+            cutoff = _age_cutoff(int(value))
+        except (TypeError, ValueError):
+            print(f"Error: Invalid value '{value}' for criteria '{criteria}'.")
+            return
+    elif criteria_lower != "emptyfile":
+        print(f"Warning: Unknown cleanup criteria '{criteria}'. No files deleted.")
+        return
+
     print(f"Cleaning up '{folder}' based on criteria '{criteria}' with value '{value}'...")
     deleted_count = 0
 
-    for root, _, files in os.walk(folder):
+    def clean_folder(root, dir_entries, file_entries):
+        # Runs on a worker thread; returns (output lines, files deleted) for the main thread to print
+        lines = []
+        deleted = 0
         normalized_root = _normalize_path(root) # Normalize root for metadata operations
         metadata = _load_metadata(normalized_root)
-        
-        # Make a copy of files list to allow modification during iteration if a file is deleted
-        for filename in list(files): 
-            filepath = os.path.join(root, filename)
-            if not os.path.isfile(filepath) or filename == METADATA_FILE:
-                continue
+        dir_fd = None
 
-            perform_delete = False
-            try:
-                if criteria.lower() == "agedays":
-                    if _is_file_older_than(filepath, int(value)):
-                        perform_delete = True
-                elif criteria.lower() == "emptyfile":
-                    if _get_file_size(filepath) == 0:
-                        perform_delete = True
-                else:
-                    print(f"Warning: Unknown cleanup criteria '{criteria}'. Skipping file '{filename}'.")
+        try:
+            # Visit files in inode order (free from scandir) so stats and deletes hit the disk sequentially
+            file_entries.sort(key=lambda e: e.inode())
+            for entry in file_entries:
+                filename = entry.name
+                filepath = entry.path
+                if filename == METADATA_FILE or not entry.is_file():
                     continue
 
-                if perform_delete:
-                    os.remove(filepath)
-                    print(f"  Deleted: '{filepath}'")
-                    deleted_count += 1
-                    # Also remove its metadata entry if it exists
-                    if filename in metadata:
-                        del metadata[filename]
-                        _save_metadata(normalized_root, metadata) # Save updated metadata (might delete if empty)
-            except ValueError:
-                print(f"Error: Invalid value '{value}' for criteria '{criteria}'.")
-                return
-            except OSError as e:
-                print(f"Error deleting '{filepath}': {e}")
+                try:
+                    if criteria_lower == "agedays":
+                        perform_delete = entry.stat().st_mtime < cutoff
+                    else:
+                        perform_delete = entry.stat().st_size == 0
+                except OSError as e:
+                    lines.append(f"Error accessing file '{filepath}': {e}")
+                    continue
 
+                if perform_delete:
+                    if dir_fd is None:
+                        dir_fd = _open_dir_fd(root) # Opened on the first deletion, then reused for the rest
+                    try:
+                        os.unlink(_path_in_dir(dir_fd, root, filename), dir_fd=dir_fd)
+                        lines.append(f"  Deleted: '{filepath}'")
+                        deleted += 1
+                        # Also remove its metadata entry if it exists
+                        if filename in metadata:
+                            del metadata[filename]
+                            _save_metadata(normalized_root, metadata) # Save updated metadata (might delete if empty)
+                    except OSError as e:
+                        lines.append(f"Error deleting '{filepath}': {e}")
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        return lines, deleted
+
+    out = _LineBuffer(quiet)
+    for lines, deleted in _scan_parallel(folder, clean_folder):
+        out.extend(lines)
+        deleted_count += deleted
+
+    out.flush()
     print(f"Finished. Total files deleted: {deleted_count}")
 
-def deduplicate(folder, dry_run):
+def deduplicate(folder, dry_run, hash_algo=DEFAULT_HASH_ALGO, quiet=False):
     """
-    Finds and removes duplicate files using SHA256 hashes.
+    Finds and removes duplicate files using content hashes.
+    'hash_algo' is one of HASH_ALGORITHMS; BLAKE3 by default, SHA256 if it isn't installed.
     """
     if not os.path.isdir(folder):
         print(f"Error: Folder '{folder}' not found.")
         return
 
+    hasher_factory = _get_hasher_factory(hash_algo)
     print(f"Searching for duplicate files in '{folder}' (dry run: {dry_run})...")
     hashes = {}
     duplicates_found = 0
     deleted_count = 0
 
-    for root, _, files in os.walk(folder):
-        normalized_root = _normalize_path(root) # Normalize root for metadata operations
-        current_folder_metadata = _load_metadata(normalized_root)
-        
-        # Create a list of files to iterate, excluding metadata file
-        files_to_process = [f for f in files if f != METADATA_FILE]
-
-        for filename in files_to_process:
-            filepath = os.path.join(root, filename)
-            if not os.path.isfile(filepath):
+    # Pass 1: list every file with its size. A file with a unique size can't have a duplicate,
+    # so most files never need to be read at all.
+    all_files = [] # (root, filename, filepath) in walk order, so the first copy found stays the original
+    files_by_size = collections.defaultdict(list)
+    inodes = {} # Free from the directory listing on POSIX; used to read files in on-disk order
+    # (size, mtime_ns, ctime_ns, inode), to check and save cached hashes. mtime can be set back by
+    # touch/rsync/cp -p after a content change, but ctime and the inode can't be set from userspace.
+    file_stats = {}
+    for root, _, file_entries in _scan(folder):
+        for entry in file_entries:
+            try:
+                if entry.name != METADATA_FILE and entry.is_file():
+                    stat = entry.stat()
+                    files_by_size[stat.st_size].append(entry.path)
+                    inodes[entry.path] = entry.inode()
+                    file_stats[entry.path] = (stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, inodes[entry.path])
+                    all_files.append((root, entry.name, entry.path))
+            except OSError:
                 continue
 
-            file_hash = get_file_hash(filepath)
+    # Reuse full hashes saved in the metadata by earlier runs, for files whose stats haven't changed
+    hash_algo_name = hasher_factory().name # The algorithm actually used, after any fallback
+    file_locations = {filepath: (root, filename) for root, filename, filepath in all_files}
+    cached_hashes = {}
+    metadata_by_root = {} # Each folder's metadata is loaded once, not once per file
+    for same_size_files in files_by_size.values():
+        if len(same_size_files) > 1:
+            for filepath in same_size_files:
+                root, filename = file_locations[filepath]
+                folder_metadata = metadata_by_root.get(root)
+                if folder_metadata is None:
+                    folder_metadata = metadata_by_root[root] = _load_metadata(_normalize_path(root))
+                file_metadata = folder_metadata.get(filename)
+                if file_metadata and file_metadata.get("hash") and file_metadata.get("hash_algo") == hash_algo_name and \
+                   (file_metadata.get("hash_size"), file_metadata.get("hash_mtime_ns"),
+                    file_metadata.get("hash_ctime_ns"), file_metadata.get("hash_ino")) == file_stats[filepath]:
+                    cached_hashes[filepath] = file_metadata["hash"]
+
+    # Pass 2: within each size group, compare only the first few KiB. Groups whose hashes are all
+    # cached are skipped. These small reads are issued in inode order, which keeps disk access mostly sequential.
+    head_candidates = sorted(
+        (
+            p for same_size_files in files_by_size.values()
+            if len(same_size_files) > 1 and not all(f in cached_hashes for f in same_size_files)
+            for p in same_size_files
+        ),
+        key=inodes.get,
+    )
+    # A 4 KiB read is cheaper than handing it to a thread, so heads are hashed inline, without prefetching
+    head_hashes = {p: _get_head_hash(p, hasher_factory) for p in head_candidates}
+
+    # Pass 3: hash whole files only when both the size and the head collide.
+    files_by_head = collections.defaultdict(list)
+    for size, same_size_files in files_by_size.items():
+        for filepath in same_size_files:
+            head_hash = head_hashes.get(filepath)
+            if head_hash:
+                files_by_head[(size, head_hash)].append(filepath)
+    # Candidates are listed largest first so the thread pool starts the slowest files early,
+    # and in inode order within each group.
+    # Files no bigger than HEAD_HASH_SIZE were read whole in pass 2, so their head hash is already the full hash.
+    full_candidates = [
+        p for (size, _), same_head_files in sorted(files_by_head.items(), reverse=True)
+        if len(same_head_files) > 1 and size > HEAD_HASH_SIZE for p in sorted(same_head_files, key=inodes.get)
+        if p not in cached_hashes
+    ]
+    new_hashes = {
+        p: head_hash for (size, head_hash), same_head_files in files_by_head.items()
+        if len(same_head_files) > 1 and size <= HEAD_HASH_SIZE for p in same_head_files
+        if p not in cached_hashes
+    }
+    new_hashes.update(_hash_files(full_candidates, lambda p: get_file_hash(p, hasher_factory), PREFETCH_SIZE))
+    full_hashes = {**cached_hashes, **new_hashes}
+    deleted_paths = set()
+
+    out = _LineBuffer(quiet)
+    # all_files is in walk order, so each folder's duplicates come together and its folder is opened once
+    dir_fd_root, dir_fd = None, None
+    try:
+        for root, filename, filepath in all_files:
+            file_hash = full_hashes.get(filepath)
             if file_hash:
                 if file_hash in hashes:
                     duplicates_found += 1
-                    print(f"  Duplicate found: '{filepath}' (original: '{hashes[file_hash]}')")
+                    out.add(f"  Duplicate found: '{filepath}' (original: '{hashes[file_hash]}')")
                     if not dry_run:
+                        if root != dir_fd_root:
+                            if dir_fd is not None:
+                                os.close(dir_fd)
+                            dir_fd_root, dir_fd = root, _open_dir_fd(root)
                         try:
-                            os.remove(filepath)
-                            print(f"    Deleted: '{filepath}'")
+                            os.unlink(_path_in_dir(dir_fd, root, filename), dir_fd=dir_fd)
+                            out.add(f"    Deleted: '{filepath}'")
                             deleted_count += 1
+                            deleted_paths.add(filepath)
                             # Remove metadata entry for the deleted duplicate
+                            normalized_root = _normalize_path(root) # Normalize root for metadata operations
+                            current_folder_metadata = _load_metadata(normalized_root)
                             if filename in current_folder_metadata:
                                 del current_folder_metadata[filename]
                                 _save_metadata(normalized_root, current_folder_metadata) # Save updated metadata (might delete if empty)
                         except OSError as e:
-                            print(f"    Error deleting duplicate '{filepath}': {e}")
+                            out.add(f"    Error deleting duplicate '{filepath}': {e}")
                 else:
                     hashes[file_hash] = filepath
-    
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+
+    # Save the new hashes with the stats they were computed for, one metadata write per folder.
+    # A dry run doesn't write anything into the tree.
+    hashes_by_folder = collections.defaultdict(list)
+    cache_before_ns = time.time_ns() - MTIME_CACHE_MIN_AGE_NS
+    for filepath, file_hash in (new_hashes.items() if not dry_run else ()):
+        # A file modified just now could change again within its mtime's granularity without its mtime changing
+        if file_hash and filepath not in deleted_paths and max(file_stats[filepath][1:3]) < cache_before_ns:
+            hashes_by_folder[file_locations[filepath][0]].append(filepath)
+    for root, filepaths in hashes_by_folder.items():
+        normalized_root = _normalize_path(root)
+        metadata = _load_metadata(normalized_root)
+        for filepath in filepaths:
+            size, mtime_ns, ctime_ns, inode = file_stats[filepath]
+            metadata.setdefault(file_locations[filepath][1], {}).update({
+                "hash": new_hashes[filepath],
+                "hash_algo": hash_algo_name,
+                "hash_size": size,
+                "hash_mtime_ns": mtime_ns,
+                "hash_ctime_ns": ctime_ns,
+                "hash_ino": inode,
+            })
+        _save_metadata(normalized_root, metadata)
+
+    out.flush()
     print(f"Finished. Found {duplicates_found} duplicate(s). {'Deleted' if not dry_run else 'Would delete'} {deleted_count} file(s).")
 
 
-def tag_file(file_path, add_tags_str, remove_tags_str, recursive):
+def tag_file(file_path, add_tags_str, remove_tags_str, recursive, files=None):
     """
     Adds or removes tags on files. Tags are stored in a hidden JSON metadata file.
+    If 'files' is given, 'file_path' must be a folder and only those files (paths relative to it)
+    are tagged, without walking the folder. Listed paths that resolve outside the folder are skipped. They're grouped by the folder they live in, so each
+    folder's metadata is loaded and saved once however many of its files are listed.
     """
     if not os.path.exists(file_path):
         print(f"Error: Path '{file_path}' not found.")
         return
-
-    if os.path.isfile(file_path):
-        target_paths = [file_path]
-    elif os.path.isdir(file_path):
-        if recursive:
-            target_paths = [os.path.join(r, f) for r, _, files in os.walk(file_path) for f in files if f != METADATA_FILE]
-        else:
-            target_paths = [os.path.join(file_path, f) for f in os.listdir(file_path) if os.path.isfile(os.path.join(file_path, f)) and f != METADATA_FILE]
-    else:
+    if not os.path.isfile(file_path) and not os.path.isdir(file_path):
         print(f"Error: '{file_path}' is neither a file nor a directory.")
         return
 
     add_tags = {tag.strip() for tag in add_tags_str.split(',') if tag.strip()}
     remove_tags = {tag.strip() for tag in remove_tags_str.split(',') if tag.strip()}
 
-    processed_count = 0
-    for path in target_paths:
-        if not os.path.isfile(path) or os.path.basename(path) == METADATA_FILE:
-            continue
+    # With nothing to add or remove, tag-file only shows each file's current tags
+    show_only = not add_tags and not remove_tags
 
-        # Correctly determine the folder for metadata, handling current directory
-        folder = os.path.dirname(path)
-        if folder == "": # If file is in current directory, dirname returns ""
-            folder = "." # Represent current directory as '.'
-        
+    def tag_folder(folder, paths):
+        # Tags files that all live in 'folder', loading and saving its metadata once.
+        # Runs on a worker thread for folder targets; returns (output lines, files updated).
+        lines = []
+        updated = 0
         normalized_folder = _normalize_path(folder) # Normalize for consistency
         metadata = _load_metadata(normalized_folder)
-        
-        file_key = os.path.basename(path)
-        
-        # Initialize tags if not present
-        if file_key not in metadata:
-            metadata[file_key] = {"tags": []}
-        elif "tags" not in metadata[file_key]:
-            metadata[file_key]["tags"] = []
-        
-        current_tags = set(metadata[file_key]["tags"])
-        
-        updated_tags = (current_tags.union(add_tags)).difference(remove_tags)
-        
-        # Only save if there's a real change to avoid unnecessary writes
-        if updated_tags != current_tags:
-            metadata[file_key]["tags"] = sorted(list(updated_tags))
+        folder_changed = False
+
+        for path in paths:
+            file_key = os.path.basename(path)
+
+            if show_only:
+                stored_tags = metadata.get(file_key, {}).get("tags", [])
+                lines.append(f"  No tag changes for '{path}'. Current tags: {', '.join(stored_tags) if stored_tags else '[No tags]'}")
+                continue
+            
+            # Read tags without adding entries: the metadata dict is cached, so it's only modified when saved
+            current_tags = set(metadata.get(file_key, {}).get("tags", []))
+            
+            updated_tags = (current_tags.union(add_tags)).difference(remove_tags)
+            
+            # Only save if there's a real change to avoid unnecessary writes
+            if updated_tags != current_tags:
+                metadata.setdefault(file_key, {})["tags"] = sorted(list(updated_tags))
+                folder_changed = True
+                lines.append(f"  Updated tags for '{path}': {', '.join(metadata[file_key]['tags']) if metadata[file_key]['tags'] else '[No tags]'}")
+                updated += 1
+            else:
+                lines.append(f"  No tag changes for '{path}'. Current tags: {', '.join(current_tags) if current_tags else '[No tags]'}")
+
+        if folder_changed:
             _save_metadata(normalized_folder, metadata) # Pass the corrected/normalized folder
-            print(f"  Updated tags for '{path}': {', '.join(metadata[file_key]['tags']) if metadata[file_key]['tags'] else '[No tags]'}")
-            processed_count += 1
+        return lines, updated
+
+    def tag_scanned_folder(root, dir_entries, file_entries):
+        if not recursive:
+            dir_entries[:] = [] # Only the given folder's own files
+        paths = [entry.path for entry in file_entries if entry.name != METADATA_FILE and entry.is_file()]
+        return tag_folder(root, paths) if paths else ([], 0)
+
+    if files is not None:
+        if not os.path.isdir(file_path):
+            print(f"Error: '{file_path}' must be a folder when files are listed.")
+            return
+        paths_by_folder = {} # {folder: [file paths]}, in the order the files were listed
+        real_folder = os.path.realpath(file_path)
+        for name in files:
+            path = os.path.join(file_path, name)
+            if os.path.basename(path) == METADATA_FILE:
+                continue
+            # Listed names are relative to the folder; don't follow '..', absolute paths or links out of it
+            real_path = os.path.realpath(path)
+            if real_path == real_folder or os.path.commonpath([real_folder, real_path]) != real_folder:
+                print(f"Error: '{path}' is outside '{file_path}'. Skipping.")
+                continue
+            if not os.path.isfile(path):
+                print(f"Warning: '{path}' is not a file. Skipping.")
+                continue
+            paths_by_folder.setdefault(os.path.dirname(path), []).append(path)
+        results = [tag_folder(folder, paths) for folder, paths in paths_by_folder.items()]
+    elif os.path.isfile(file_path):
+        if os.path.basename(file_path) == METADATA_FILE:
+            results = []
         else:
-            print(f"  No tag changes for '{path}'. Current tags: {', '.join(current_tags) if current_tags else '[No tags]'}")
+            # Correctly determine the folder for metadata, handling current directory
+            folder = os.path.dirname(file_path)
+            if folder == "": # If file is in current directory, dirname returns ""
+                folder = "." # Represent current directory as '.'
+            results = [tag_folder(folder, [file_path])]
+    else:
+        # Each folder's files are tagged together, with subtrees handled on a thread pool
+        results = _scan_parallel(file_path, tag_scanned_folder)
+
+    processed_count = 0
+    out = _LineBuffer()
+    for lines, updated in results:
+        out.extend(lines)
+        processed_count += updated
+    out.flush()
 
     print(f"Finished tagging. Processed {processed_count} file(s).")
 
 
-def search_tag(folder, tag_str): # Renamed 'tag' to 'tag_str' for clarity
+def search_tag(folder, tag_str, quiet=False): # Renamed 'tag' to 'tag_str' for clarity
     """
     Finds files with any of the specified tags (OR logic).
     Tags can be comma-separated.
+    Tags are cached in one index file per searched folder under TAG_INDEX_DIR (see _tag_index_path).
+    A folder's cached tags are used only while its metadata file has the same st_mtime_ns and
+    st_size as when they were cached, and metadata files changed within MTIME_CACHE_MIN_AGE_NS
+    aren't cached at all, so an edit in the same clock tick can't go unnoticed. The tree is
+    still walked on every search to check this; only unchanged metadata files skip parsing.
     """
     if not os.path.isdir(folder):
         print(f"Error: Folder '{folder}' not found.")
@@ -541,23 +1256,113 @@ def search_tag(folder, tag_str): # Renamed 'tag' to 'tag_str' for clarity
     print(f"Searching for files with any of tags {list(search_tags)} in '{folder}'...")
     found_count = 0
 
-    for root, _, files in os.walk(folder):
-        normalized_root = _normalize_path(root)
-        metadata = _load_metadata(normalized_root)
-        for filename in files:
-            if filename == METADATA_FILE:
-                continue
-            
-            file_key = filename
-            if file_key in metadata and "tags" in metadata[file_key]:
-                file_tags = set(metadata[file_key]["tags"]) # Convert file's tags to a set for efficient checking
-                
-                # 2. Check for OR logic: if any search tag is in file_tags
-                if any(st in file_tags for st in search_tags):
-                    print(f"  Found: {os.path.join(root, filename)} (Tags: {', '.join(file_tags)})")
-                    found_count += 1
+    # Tags from the last search of this folder, reused for metadata files that haven't changed since
+    index_path = _tag_index_path(folder)
+    cached_folders = _load_tag_index(index_path)
+    cache_before_ns = time.time_ns() - MTIME_CACHE_MIN_AGE_NS
+
+    def search_folder(root, dir_entries, file_entries):
+        # Runs on a worker thread; returns (lines to print, folder key, index entry or None, reparsed)
+        found = []
+        metadata_entry = next((entry for entry in file_entries if entry.name == METADATA_FILE), None)
+        if metadata_entry is None:
+            return found, None, None, False
+        folder_key = os.path.relpath(root, folder)
+        try:
+            metadata_stat = metadata_entry.stat()
+        except OSError:
+            return found, folder_key, None, False
+
+        cached = cached_folders.get(folder_key)
+        if cached is not None and cached[0] == metadata_stat.st_mtime_ns and cached[1] == metadata_stat.st_size:
+            tags_by_file = cached[2]
+            reparsed = False
+        else:
+            metadata = _load_metadata(_normalize_path(root))
+            tags_by_file = {name: info["tags"] for name, info in metadata.items()
+                            if isinstance(info, dict) and info.get("tags")}
+            reparsed = True
+
+        for entry in file_entries:
+            file_tags = tags_by_file.get(entry.name)
+            # 2. Check for OR logic: if any search tag is in file_tags
+            if file_tags and entry.name != METADATA_FILE and not search_tags.isdisjoint(file_tags):
+                found.append(f"  Found: {entry.path} (Tags: {', '.join(set(file_tags))})")
+
+        index_entry = None
+        if metadata_stat.st_mtime_ns < cache_before_ns:
+            index_entry = [metadata_stat.st_mtime_ns, metadata_stat.st_size, tags_by_file]
+        return found, folder_key, index_entry, reparsed
+
+    out = _LineBuffer(quiet)
+    index_folders = {}
+    index_changed = False
+    for found, folder_key, index_entry, reparsed in _scan_parallel(folder, search_folder):
+        out.extend(found)
+        found_count += len(found)
+        if index_entry is not None:
+            index_folders[folder_key] = index_entry
+        index_changed = index_changed or reparsed
+    out.flush()
     print(f"Finished. Found {found_count} file(s) with matching tags.")
 
+    # Only rewritten when a metadata file had to be parsed; entries for folders whose metadata
+    # file is gone are harmless until then, since they're only looked up for existing files
+    if index_changed:
+        _save_tag_index(index_path, folder, index_folders)
+
+def _tag_index_path(folder):
+    """
+    Returns the path of the tag index file for 'folder', named after a hash of its absolute path.
+    Only this one file is read for a search; searching a subfolder uses its own index file.
+    """
+    import hashlib
+    folder_id = hashlib.sha1(_normalize_path(folder).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(TAG_INDEX_DIR, folder_id + ".json")
+
+def _load_tag_index(index_path):
+    """
+    Returns the folders saved in a tag index file, as
+    {folder path relative to the searched folder: [metadata st_mtime_ns, st_size, {filename: tags}]},
+    or {} if there's no usable index. A loaded index file is touched, so eviction goes by last use.
+    """
+    try:
+        with open(index_path, 'rb') as f:
+            index_folders = _json_loads(f.read()).get("folders", {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+    try:
+        os.utime(index_path)
+    except OSError:
+        pass
+    return index_folders
+
+def _save_tag_index(index_path, folder, index_folders):
+    """
+    Writes a tag index file (compact JSON, temp file and rename). When that adds a new index file,
+    the least recently used ones beyond TAG_INDEX_MAX_FILES are deleted; the cap is shared by every
+    folder the user searches, not set per tree. Rewriting an existing index file doesn't look at
+    the others. It's only a cache, so failures are warnings.
+    """
+    try:
+        os.makedirs(TAG_INDEX_DIR, exist_ok=True)
+        is_new = not os.path.exists(index_path)
+        temp_path = index_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(_json_dumps({"folder": _normalize_path(folder), "folders": index_folders}, indent=False))
+        os.replace(temp_path, index_path)
+        if not is_new:
+            return
+
+        with os.scandir(TAG_INDEX_DIR) as entries:
+            index_files = [entry for entry in entries if entry.name.endswith(".json")]
+        if len(index_files) > TAG_INDEX_MAX_FILES:
+            index_files.sort(key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+            for entry in index_files[TAG_INDEX_MAX_FILES:]:
+                os.remove(entry.path)
+    except OSError as e:
+        print(f"Warning: Could not save the tag index '{index_path}': {e}")
+
 
 
 def file_activity_graph(folder):
@@ -579,14 +1384,14 @@ def file_activity_graph(folder):
     daily_activity = collections.defaultdict(list)
     
     # Iterate through all files in the folder (including subfolders)
-    for root, _, files in os.walk(folder):
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            if not os.path.isfile(filepath) or filename == METADATA_FILE:
+    for _, _, file_entries in _scan(folder):
+        for entry in file_entries:
+            filepath = entry.path
+            if entry.name == METADATA_FILE or not entry.is_file():
                 continue
             
             try:
-                mod_timestamp = os.path.getmtime(filepath)
+                mod_timestamp = entry.stat().st_mtime
                 mod_date = datetime.fromtimestamp(mod_timestamp)
 
                 if start_date.date() <= mod_date.date() <= end_date.date():
@@ -653,7 +1458,101 @@ def file_activity_graph(folder):
     print("=" * TABLE_WIDTH) # End of total table
     print(f"\nAnalysis Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
 
-def search_meta(folder, json_query_str):
+@functools.lru_cache(maxsize=128)
+def _parse_meta_query(json_query_str):
+    """
+    Parses a search-meta JSON query, cached by the query string for repeated searches.
+    The returned dict is shared between calls, so it must not be modified.
+    """
+    return _json_loads(json_query_str)
+
+def _compile_meta_query(query):
+    """
+    Turns a search-meta query into a list of predicates over a file's combined metadata,
+    so each key's value is checked and parsed once rather than once per file.
+    Prints a warning and returns None if a key's value is invalid, since then nothing can match.
+    """
+    predicates = []
+    for query_key, query_value in query.items():
+        # Handle specific query keys that require custom logic
+        # Case-insensitive substring matches: the needle is case-folded once; an IGNORECASE regex
+        # would be several times slower, since it can't use the fast literal search
+        if query_key == "name":
+            predicates.append(lambda m, needle=query_value.casefold(): needle in m["name"].casefold())
+        elif query_key == "path":
+            predicates.append(lambda m, needle=query_value.casefold(): needle in m["path"].casefold())
+        elif query_key == "size":
+            if isinstance(query_value, dict):
+                if "gt" in query_value:
+                    predicates.append(lambda m, gt=query_value["gt"]: m["size"] > gt)
+                if "lt" in query_value:
+                    predicates.append(lambda m, lt=query_value["lt"]: m["size"] < lt)
+                if "eq" in query_value:
+                    predicates.append(lambda m, eq=query_value["eq"]: m["size"] == eq)
+            elif isinstance(query_value, (int, float)): # Direct number for exact match
+                predicates.append(lambda m, eq=query_value: m["size"] == eq)
+            else:
+                print(f"Warning: 'size' query requires a number or an object with 'gt', 'lt', 'eq' keys.")
+                return None
+        elif query_key == "type":
+            # Supports single string or list of strings (OR logic for list)
+            if isinstance(query_value, str):
+                predicates.append(lambda m, ext=query_value.lower(): m["type"] == ext)
+            elif isinstance(query_value, list):
+                predicates.append(lambda m, exts=frozenset(t.lower() for t in query_value): m["type"] in exts)
+            else:
+                print(f"Warning: 'type' query requires a string or a list of strings.")
+                return None
+        elif query_key == "last_modified":
+            if isinstance(query_value, dict):
+                if "after" in query_value:
+                    try:
+                        # Allow YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS
+                        after_date = datetime.fromisoformat(query_value["after"])
+                    except ValueError:
+                        print(f"Warning: Invalid 'after' date format for '{query_key}'. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS).")
+                        return None
+                    predicates.append(lambda m, after_date=after_date: m["last_modified"] >= after_date) # >= to include the start of the day
+                if "before" in query_value:
+                    try:
+                        before_date = datetime.fromisoformat(query_value["before"])
+                    except ValueError:
+                        print(f"Warning: Invalid 'before' date format for '{query_key}'. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS).")
+                        return None
+                    predicates.append(lambda m, before_date=before_date: m["last_modified"] <= before_date) # <= to include the end of the day if just date is given
+            else:
+                print(f"Warning: 'last_modified' query requires an object with 'after' and/or 'before' keys.")
+                return None
+        elif query_key == "ageDays":
+            try:
+                required_age = int(query_value)
+            except ValueError:
+                print(f"Warning: 'ageDays' value must be an integer.")
+                return None
+            # Older than N days means modified before this moment, so the cutoff is computed once
+            cutoff = datetime.now() - timedelta(days=required_age)
+            predicates.append(lambda m, cutoff=cutoff: m["last_modified"] < cutoff)
+        elif query_key == "tags":
+            if isinstance(query_value, list):
+                # AND logic: all queried tags must be in the file's tags
+                predicates.append(lambda m, wanted=frozenset(query_value): wanted.issubset(m["tags"]))
+            elif isinstance(query_value, str):
+                # Exact single tag match
+                predicates.append(lambda m, tag=query_value: tag in m["tags"])
+            else:
+                print(f"Warning: 'tags' query requires a string or list of strings.")
+                return None
+        elif query_key == "mood":
+            predicates.append(lambda m, mood=query_value.lower(): m.get("mood") == mood)
+        elif query_key == "mood_name":
+            predicates.append(lambda m, mood_name=query_value: m.get("mood_name") == mood_name) # Case-sensitive
+        else:
+            # For any other key not explicitly handled, assume direct equality if present
+            # This makes it extensible without writing an 'elif' for every new simple field
+            predicates.append(lambda m, key=query_key, value=query_value: m.get(key) == value)
+    return predicates
+
+def search_meta(folder, json_query_str, quiet=False):
     """
     Finds files based on a rich set of metadata criteria.
     The query is a JSON string where keys map to file metadata properties.
@@ -687,7 +1586,7 @@ def search_meta(folder, json_query_str):
         return
 
     try:
-        query = json.loads(json_query_str)
+        query = _parse_meta_query(json_query_str)
     except json.JSONDecodeError as e:
         print(f"Error: Invalid JSON query for search-meta: {e}")
         return
@@ -695,17 +1594,30 @@ def search_meta(folder, json_query_str):
     print(f"Searching for files in '{folder}' with metadata query:\n{json.dumps(query, indent=2)}")
     found_count = 0
 
-    for root, _, files in os.walk(folder):
+    try:
+        predicates = _compile_meta_query(query)
+    except (AttributeError, TypeError, ValueError) as e:
+        print(f"Error: Invalid value in search-meta query: {e}")
+        return
+    if predicates is None:
+        print(f"Finished. Found {found_count} file(s) matching criteria.")
+        return
+
+    def search_folder(root, dir_entries, file_entries):
+        # Runs on a worker thread; returns (output lines, files found) for the main thread to print
+        lines = []
+        found = 0
         normalized_root = _normalize_path(root)
         metadata_from_file = _load_metadata(normalized_root)
         
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            if not os.path.isfile(filepath) or filename == METADATA_FILE:
+        for entry in file_entries:
+            filename = entry.name
+            filepath = entry.path
+            if filename == METADATA_FILE or not entry.is_file():
                 continue
 
             try:
-                stat = os.stat(filepath)
+                stat = entry.stat()
                 file_size = stat.st_size
                 mod_time = datetime.fromtimestamp(stat.st_mtime)
                 file_extension = os.path.splitext(filename)[1].lstrip('.').lower()
@@ -723,140 +1635,34 @@ def search_meta(folder, json_query_str):
                     "mood_name": metadata_from_file.get(filename, {}).get("mood", {}).get("name")
                 }
 
-                match = True
-                for query_key, query_value in query.items():
-                    # Handle specific query keys that require custom logic
-                    if query_key == "name":
-                        if query_value.lower() not in file_metadata["name"].lower():
-                            match = False
-                            break
-                    elif query_key == "path":
-                        if query_value.lower() not in file_metadata["path"].lower():
-                            match = False
-                            break
-                    elif query_key == "size":
-                        if isinstance(query_value, dict):
-                            if "gt" in query_value and not (file_size > query_value["gt"]):
-                                match = False
-                                break
-                            if "lt" in query_value and not (file_size < query_value["lt"]):
-                                match = False
-                                break
-                            if "eq" in query_value and not (file_size == query_value["eq"]):
-                                match = False
-                                break
-                        elif isinstance(query_value, (int, float)): # Direct number for exact match
-                            if file_size != query_value:
-                                match = False
-                                break
-                        else:
-                            print(f"Warning: 'size' query requires a number or an object with 'gt', 'lt', 'eq' keys.")
-                            match = False
-                            break
-                    elif query_key == "type":
-                        # Supports single string or list of strings (OR logic for list)
-                        if isinstance(query_value, str):
-                            if file_metadata["type"] != query_value.lower():
-                                match = False
-                                break
-                        elif isinstance(query_value, list):
-                            if file_metadata["type"] not in [t.lower() for t in query_value]:
-                                match = False
-                                break
-                        else:
-                            print(f"Warning: 'type' query requires a string or a list of strings.")
-                            match = False
-                            break
-                    elif query_key == "last_modified":
-                        if isinstance(query_value, dict):
-                            if "after" in query_value:
-                                try:
-                                    # Allow YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS
-                                    after_date = datetime.fromisoformat(query_value["after"])
-                                    if not (file_metadata["last_modified"] >= after_date): # >= to include the start of the day
-                                        match = False
-                                        break
-                                except ValueError:
-                                    print(f"Warning: Invalid 'after' date format for '{query_key}'. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS).")
-                                    match = False
-                                    break
-                            if "before" in query_value:
-                                try:
-                                    before_date = datetime.fromisoformat(query_value["before"])
-                                    if not (file_metadata["last_modified"] <= before_date): # <= to include the end of the day if just date is given
-                                        match = False
-                                        break
-                                except ValueError:
-                                    print(f"Warning: Invalid 'before' date format for '{query_key}'. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS).")
-                                    match = False
-                                    break
-                        else:
-                            print(f"Warning: 'last_modified' query requires an object with 'after' and/or 'before' keys.")
-                            match = False
-                            break
-                    elif query_key == "ageDays":
-                        try:
-                            required_age = int(query_value)
-                            if not _is_file_older_than(filepath, required_age):
-                                match = False
-                                break
-                        except ValueError:
-                            print(f"Warning: 'ageDays' value must be an integer.")
-                            match = False
-                            break
-                    elif query_key == "tags":
-                        file_tags_set = set(file_metadata["tags"])
-                        if isinstance(query_value, list):
-                            # AND logic: all queried tags must be in the file's tags
-                            if not all(tag in file_tags_set for tag in query_value):
-                                match = False
-                                break
-                        elif isinstance(query_value, str):
-                            # Exact single tag match
-                            if query_value not in file_tags_set:
-                                match = False
-                                break
-                        else:
-                            print(f"Warning: 'tags' query requires a string or list of strings.")
-                            match = False
-                            break
-                    elif query_key == "mood":
-                        if file_metadata.get("mood") != query_value.lower():
-                            match = False
-                            break
-                    elif query_key == "mood_name":
-                        if file_metadata.get("mood_name") != query_value: # Case-sensitive
-                            match = False
-                            break
-                    else:
-                        # For any other key not explicitly handled, assume direct equality if present
-                        # This makes it extensible without writing an 'elif' for every new simple field
-                        if file_metadata.get(query_key) != query_value:
-                            match = False
-                            break
-                    
-                    if not match: # If any condition failed, no need to check further
-                        break
-
-                if match:
+                if all(predicate(file_metadata) for predicate in predicates):
                     # Format last_modified for display
                     display_mod_time = file_metadata["last_modified"].strftime('%Y-%m-%d %H:%M:%S')
-                    print(f"  Found: {filepath} (Size: {file_size} bytes, Modified: {display_mod_time}, Type: .{file_metadata['type']}, Tags: {', '.join(file_metadata['tags'])})")
-                    found_count += 1
+                    lines.append(f"  Found: {filepath} (Size: {file_size} bytes, Modified: {display_mod_time}, Type: .{file_metadata['type']}, Tags: {', '.join(file_metadata['tags'])})")
+                    found += 1
 
             except OSError as e:
-                print(f"Error accessing file '{filepath}': {e}")
+                lines.append(f"Error accessing file '{filepath}': {e}")
             except ValueError as e:
-                print(f"Error processing query/file '{filepath}': {e}. Check query values or file data types.")
+                lines.append(f"Error processing query/file '{filepath}': {e}. Check query values or file data types.")
             except Exception as e:
-                print(f"An unexpected error occurred for '{filepath}': {e}")
+                lines.append(f"An unexpected error occurred for '{filepath}': {e}")
+        return lines, found
 
+    out = _LineBuffer(quiet)
+    for lines, found in _scan_parallel(folder, search_folder):
+        out.extend(lines)
+        found_count += found
+
+    out.flush()
     print(f"Finished. Found {found_count} file(s) matching criteria.")
 
 def exec_script(script_path, args):
     """
     Runs custom scripts (e.g., Python, Node.js).
     """
+    import subprocess
+
     if not os.path.exists(script_path):
         print(f"Error: Script '{script_path}' not found.")
         return
@@ -909,37 +1715,44 @@ def health_check(folder):
     print(f"Performing health check on '{folder}'...")
     issues_found = 0
 
-    for root, dirs, files in os.walk(folder):
-        # Remove the metadata file from the list of files to check
-        if METADATA_FILE in files:
-            files.remove(METADATA_FILE)
-
+    def check_folder(root, dir_entries, file_entries):
+        # Runs on a worker thread; returns (output lines, issues found) for the main thread to print
+        lines = []
+        issues = 0
         # Check directories
-        for d in dirs:
-            dir_path = os.path.join(root, d)
-            if not os.path.isdir(dir_path):
-                print(f"  Issue: Directory '{dir_path}' found in listing but not accessible or is not a directory.")
-                issues_found += 1
-            elif os.path.islink(dir_path) and not os.path.exists(os.readlink(dir_path)):
-                print(f"  Issue: Broken symlink to directory: '{dir_path}' -> '{os.readlink(dir_path)}'")
-                issues_found += 1
-
-        # Check files
-        for f in files:
-            file_path = os.path.join(root, f)
-            if not os.path.isfile(file_path):
-                print(f"  Issue: File '{file_path}' found in listing but not accessible or is not a regular file.")
-                issues_found += 1
-            elif os.path.islink(file_path) and not os.path.exists(os.readlink(file_path)):
-                print(f"  Issue: Broken symlink to file: '{file_path}' -> '{os.readlink(file_path)}'")
-                issues_found += 1
+        for d in dir_entries:
+            dir_path = d.path
+            if not d.is_dir():
+                lines.append(f"  Issue: Directory '{dir_path}' found in listing but not accessible or is not a directory.")
+                issues += 1
+            elif d.is_symlink() and not os.path.exists(os.readlink(dir_path)):
+                lines.append(f"  Issue: Broken symlink to directory: '{dir_path}' -> '{os.readlink(dir_path)}'")
+                issues += 1
+
+        # Check files, skipping the metadata file
+        for f in file_entries:
+            if f.name == METADATA_FILE:
+                continue
+            file_path = f.path
+            if not f.is_file():
+                lines.append(f"  Issue: File '{file_path}' found in listing but not accessible or is not a regular file.")
+                issues += 1
+            elif f.is_symlink() and not os.path.exists(os.readlink(file_path)):
+                lines.append(f"  Issue: Broken symlink to file: '{file_path}' -> '{os.readlink(file_path)}'")
+                issues += 1
             # Add checks for empty files, zero-size files, etc.
             try:
-                if os.path.getsize(file_path) == 0:
-                    print(f"  Warning: Empty file found: '{file_path}'")
+                if f.stat().st_size == 0:
+                    lines.append(f"  Warning: Empty file found: '{file_path}'")
             except OSError:
-                print(f"  Issue: Cannot get size of '{file_path}'. Possible permissions issue or corruption.")
-                issues_found += 1
+                lines.append(f"  Issue: Cannot get size of '{file_path}'. Possible permissions issue or corruption.")
+                issues += 1
+        return lines, issues
+
+    for lines, issues in _scan_parallel(folder, check_folder):
+        for line in lines:
+            print(line)
+        issues_found += issues
 
     if issues_found == 0:
         print("Health check completed: No significant issues found.")
@@ -947,67 +1760,143 @@ def health_check(folder):
         print(f"Health check completed: Found {issues_found} issue(s).")
 
 
-def export_map(folder, json_file):
+class _JSONStreamer:
+    """
+    Writes a JSON object to a binary file one key at a time, so the whole
+    object never has to be built in memory before it's written.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._first = True
+        f.write(b"{")
+
+    def write(self, key, value):
+        """Appends one 'key: value' member, indented like _json_dumps output."""
+        self._f.write(b"\n  " if self._first else b",\n  ")
+        self._first = False
+        # Raw newlines only occur between JSON tokens (never inside strings), so this just re-indents
+        self._f.write(_json_dumps(key) + b": " + _json_dumps(value).replace(b"\n", b"\n  "))
+
+    def close(self):
+        """Closes the JSON object. The underlying file is left open."""
+        self._f.write(b"}" if self._first else b"\n}")
+
+
+class _JSONArrayStreamer:
+    """
+    Writes a JSON array to a binary file one compact item per line, so the
+    whole list never has to be built in memory before it's written.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._first = True
+        f.write(b"[")
+
+    def append(self, item):
+        self._f.write(b"\n" if self._first else b",\n")
+        self._first = False
+        self._f.write(_json_dumps(item, indent=False))
+
+    def close(self):
+        """Closes the JSON array. The underlying file is left open."""
+        self._f.write(b"]\n" if self._first else b"\n]\n")
+
+
+def export_map(folder, json_file, stream=False):
     """
     Creates a JSON catalog of your files with basic metadata.
+    Each folder's entry is written out as soon as it's scanned, so memory use doesn't grow with the tree.
+    With 'stream', writes a flat array with one record per file instead, each with its relative 'path'.
     """
     if not os.path.isdir(folder):
         print(f"Error: Folder '{folder}' not found.")
         return
 
     print(f"Exporting folder map of '{folder}' to '{json_file}'...")
-    file_map = {}
-
-    for root, dirs, files in os.walk(folder):
-        normalized_root = _normalize_path(root) # Normalize root for metadata operations
-        relative_path = os.path.relpath(normalized_root, _normalize_path(folder))
-        if relative_path == ".":
-            relative_path = "" # For the root folder itself
-
-        folder_data = {"files": [], "subdirectories": []}
-
-        # Load folder-specific metadata
-        folder_metadata = _load_metadata(normalized_root)
-        if "__folder__" in folder_metadata: # Check directly if key exists
-            if "mood" in folder_metadata["__folder__"]:
-                folder_data["mood"] = folder_metadata["__folder__"]["mood"]
-        
-        # Filter out the metadata file directory if it somehow gets listed as a directory
-        dirs[:] = [d for d in dirs if d != METADATA_FILE.strip('.')] # Modify dirs in place for os.walk
-        for d in dirs:
-            folder_data["subdirectories"].append(d)
-
-        # Filter out the metadata file from the files list
-        files_to_process = [f for f in files if f != METADATA_FILE]
-        for f in files_to_process:
-            filepath = os.path.join(root, f)
-            try:
-                stat = os.stat(filepath)
-                file_info = {
-                    "name": f,
-                    "size": stat.st_size,
-                    "last_modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                    "type": os.path.splitext(f)[1].lstrip('.').lower(),
-                }
-                # Add stored metadata
-                if f in folder_metadata:
-                    file_info.update(folder_metadata[f])
-                folder_data["files"].append(file_info)
-            except OSError as e:
-                print(f"Warning: Could not get info for '{filepath}': {e}")
-
-        # Store the folder data using its relative path as key
-        # Only store if there's actual data for the folder (files, subdirs, or folder mood)
-        if folder_data["files"] or folder_data["subdirectories"] or "mood" in folder_data:
-            file_map[relative_path if relative_path else "/"] = folder_data
+    normalized_folder = _normalize_path(folder)
 
     try:
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(file_map, f, indent=4)
+        with open(json_file, 'wb') as out:
+            # The output file exists while the tree is scanned; don't catalog it if it's inside 'folder'
+            out_stat = os.fstat(out.fileno())
+            streamer = _JSONArrayStreamer(out) if stream else _JSONStreamer(out)
+
+            def map_folder(root, dir_entries, file_entries):
+                # Runs on a worker thread; returns (relative path, folder data or None, warnings) for the main thread
+                warnings = []
+                normalized_root = _normalize_path(root) # Normalize root for metadata operations
+                relative_path = os.path.relpath(normalized_root, normalized_folder)
+                if relative_path == ".":
+                    relative_path = "" # For the root folder itself
+
+                folder_data = {"files": [], "subdirectories": []}
+
+                # Load folder-specific metadata
+                folder_metadata = _load_metadata(normalized_root)
+                if "__folder__" in folder_metadata: # Check directly if key exists
+                    if "mood" in folder_metadata["__folder__"]:
+                        folder_data["mood"] = folder_metadata["__folder__"]["mood"]
+                
+                # Filter out the metadata file directory if it somehow gets listed as a directory
+                # Sorted by name so the map doesn't depend on listing order; in place, so the walk follows it too
+                dir_entries[:] = sorted((d for d in dir_entries if d.name != METADATA_FILE.strip('.')), key=lambda d: d.name)
+                for d in dir_entries:
+                    folder_data["subdirectories"].append(d.name)
+
+                # Filter out the metadata file from the files list, and stat in inode order (free from scandir)
+                # so the inode table is read sequentially
+                files_to_process = sorted((entry for entry in file_entries if entry.name != METADATA_FILE), key=lambda e: e.inode())
+                for entry in files_to_process:
+                    f = entry.name
+                    filepath = entry.path
+                    try:
+                        stat = entry.stat()
+                        if stat.st_ino == out_stat.st_ino and os.path.samefile(filepath, json_file):
+                            continue
+                        file_info = {
+                            "name": f,
+                            "size": stat.st_size,
+                            "last_modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                            "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                            "type": os.path.splitext(f)[1].lstrip('.').lower(),
+                        }
+                        # Add stored metadata, except deduplicate's hash cache
+                        if f in folder_metadata:
+                            file_info.update({key: value for key, value in folder_metadata[f].items() if key not in HASH_CACHE_FIELDS})
+                        folder_data["files"].append(file_info)
+                    except OSError as e:
+                        warnings.append(f"Warning: Could not get info for '{filepath}': {e}")
+                # Files were stat'ed in inode order; list them by name
+                folder_data["files"].sort(key=lambda file_info: file_info["name"])
+
+                # Store the folder data using its relative path as key
+                # Only store if there's actual data for the folder (files, subdirs, or folder mood)
+                if folder_data["files"] or folder_data["subdirectories"] or "mood" in folder_data:
+                    return relative_path, folder_data, warnings
+                return relative_path, None, warnings
+
+            for relative_path, folder_data, warnings in _scan_parallel(folder, map_folder):
+                for warning in warnings:
+                    print(warning)
+                if folder_data is None:
+                    continue
+                if stream:
+                    for file_info in folder_data["files"]:
+                        streamer.append({"path": os.path.join(relative_path, file_info["name"]), **file_info})
+                else:
+                    streamer.write(relative_path if relative_path else "/", folder_data)
+
+            streamer.close()
         print(f"Folder map exported successfully to '{json_file}'.")
-    except IOError as e:
+    except (IOError, TypeError, ValueError) as e:
+        # Serialization errors are TypeError/ValueError; either way don't leave half a map behind
         print(f"Error exporting folder map to '{json_file}': {e}")
+        try:
+            os.remove(json_file)
+        except OSError:
+            pass
 
 
 def apply_rules(folder):
@@ -1025,19 +1914,223 @@ def apply_rules(folder):
     print("Example: Automatically moving images to 'Photos' folder, or compressing old archives.")
     print("For now, manually run other commands like 'conditional-move-copy' or 'auto-cleanup'.")
 
+class _ScheduleChanged(Exception):
+    """Raised in the scheduler daemon's sleep when schedule-command has added a job."""
+
+def _lock_schedule():
+    """Takes an exclusive lock on the schedule. Returns the lock file's fd; closing it releases the lock."""
+    import fcntl
+    os.makedirs(USER_DATA_DIR, exist_ok=True)
+    lock_fd = os.open(SCHEDULE_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(lock_fd, fcntl.LOCK_EX)
+    return lock_fd
+
+def _read_schedule():
+    """Returns the schedule as {"pid": scheduler daemon pid or None, "jobs": [pending jobs]}."""
+    try:
+        with open(SCHEDULE_FILE, 'rb') as f:
+            return _json_loads(f.read())
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError:
+        print(f"Warning: Schedule file '{SCHEDULE_FILE}' is corrupted. Starting with an empty schedule.")
+    return {"pid": None, "jobs": []}
+
+def _write_schedule(schedule):
+    """Replaces the schedule file with 'schedule' (temp file and rename, like the metadata files)."""
+    temp_path = SCHEDULE_FILE + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_json_dumps(schedule))
+    os.replace(temp_path, SCHEDULE_FILE)
+
+def _claim_schedule_daemon_lock():
+    """
+    Takes the lock a scheduler daemon holds for as long as it runs. Returns its fd, or None if a
+    daemon is running. The kernel drops the lock when the daemon exits however it dies, so unlike
+    the pid in the schedule file, this can't mistake an unrelated process for the daemon.
+    """
+    import fcntl
+    lock_fd = os.open(SCHEDULE_DAEMON_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(lock_fd)
+        return None
+    return lock_fd
+
+def _run_schedule_daemon(daemon_lock_fd):
+    """
+    Runs in the forked scheduler process. Keeps every pending job from the schedule file in one
+    sched.scheduler and sleeps until the earliest is due, then exits once no jobs are left.
+    schedule-command sends SIGUSR1 after adding a job, which cuts the current sleep short so
+    the new job is picked up. 'daemon_lock_fd' holds the daemon lock until the daemon is done.
+    Returns the exit status.
+    """
+    import sched
+    import signal
+    import subprocess
+
+    script_path = os.path.abspath(__file__) # Before leaving the folder a relative __file__ points from
+    os.setsid() # Detach from the terminal, so closing it doesn't stop the daemon
+    os.chdir("/")
+    null_fd = os.open(os.devnull, os.O_RDONLY)
+    log_fd = os.open(SCHEDULE_LOG_FILE, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    os.dup2(null_fd, 0)
+    os.dup2(log_fd, 1)
+    os.dup2(log_fd, 2)
+
+    # The signal only interrupts sleeps; one that arrives while a job runs is noticed at the next sleep
+    state = {"sleeping": False, "changed": False}
+
+    def on_schedule_changed(signum, frame):
+        state["changed"] = True
+        if state["sleeping"]:
+            raise _ScheduleChanged()
+
+    def sleep(seconds):
+        state["sleeping"] = True
+        try:
+            if state["changed"]:
+                raise _ScheduleChanged()
+            time.sleep(seconds)
+        finally:
+            state["sleeping"] = False
+
+    def run_job(job):
+        # Dropped from the schedule before it runs, so a daemon that dies mid-job doesn't repeat it
+        lock_fd = _lock_schedule()
+        try:
+            schedule = _read_schedule()
+            schedule["jobs"] = [pending for pending in schedule["jobs"] if pending["id"] != job["id"]]
+            _write_schedule(schedule)
+        finally:
+            os.close(lock_fd)
+
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Running '{job['name']}': {' '.join(job['args'])}", flush=True)
+        try:
+            result = subprocess.run([sys.executable, script_path] + job["args"], cwd=job["cwd"])
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] '{job['name']}' finished with exit code {result.returncode}.", flush=True)
+        except OSError as e:
+            print(f"Error running scheduled command '{job['name']}': {e}", flush=True)
+
+    signal.signal(signal.SIGUSR1, on_schedule_changed)
+    # Blocked by schedule_command across the fork; a signal sent since then is delivered now
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGUSR1})
+    # Wall-clock time, since run_at times are shared between processes through the schedule file
+    scheduler = sched.scheduler(time.time, sleep)
+    queued = set() # Ids of the jobs already entered in the scheduler
+
+    while True:
+        lock_fd = _lock_schedule()
+        try:
+            state["changed"] = False
+            schedule = _read_schedule()
+            if schedule.get("pid") != os.getpid():
+                return 0 # Another daemon has taken over the schedule
+            new_jobs = [job for job in schedule["jobs"] if job["id"] not in queued]
+            if not new_jobs and scheduler.empty():
+                schedule["pid"] = None
+                _write_schedule(schedule)
+                # Released before the schedule is, so a job added next starts a new daemon
+                os.close(daemon_lock_fd)
+                return 0
+        finally:
+            os.close(lock_fd)
+
+        for job in new_jobs:
+            queued.add(job["id"])
+            scheduler.enterabs(job["run_at"], 0, run_job, (job,))
+        try:
+            scheduler.run()
+        except _ScheduleChanged:
+            pass
+
 def schedule_command(name, delay_ms, command_args):
     """
-    Schedules a command to run later.
-    This is conceptual for a single-file script.
-    Real scheduling requires persistent tasks (cron on Linux/macOS, Task Scheduler on Windows)
-    or a dedicated Python scheduling library (e.g., `APScheduler`, `schedule`).
+    Schedules a superhxpro command to run later.
+    On Linux/macOS the job is saved to the schedule file and run by a single background daemon,
+    which the first scheduled job starts and which exits when no jobs are left. Jobs still pending
+    when the daemon stops are picked up by the next daemon started. Output goes to the schedule log.
+    On Windows this is conceptual; use Task Scheduler there.
     """
     delay_seconds = delay_ms / 1000
-    print(f"Scheduling command '{' '.join(command_args)}' with name '{name}' to run in {delay_seconds:.2f} seconds...")
-    print("Note: This is a conceptual scheduling. For real-world use, consider:")
-    print("  - Linux/macOS: cron jobs")
-    print("  - Windows: Task Scheduler")
-    print("  - Python libraries: 'schedule' or 'APScheduler' (requires a running process)")
+    if not command_args:
+        print("Error: No command given to schedule.")
+        return
+    if delay_ms < 0:
+        print("Error: The delay can't be negative.")
+        return
+
+    if not hasattr(os, "fork"):
+        print(f"Scheduling command '{' '.join(command_args)}' with name '{name}' to run in {delay_seconds:.2f} seconds...")
+        print("Note: This is a conceptual scheduling on this platform. For real-world use, consider:")
+        print("  - Windows: Task Scheduler")
+        print("  - Python libraries: 'schedule' or 'APScheduler' (requires a running process)")
+        return
+
+    import signal
+
+    try:
+        lock_fd = _lock_schedule()
+    except OSError as e:
+        print(f"Error: Could not open the schedule in '{USER_DATA_DIR}': {e}")
+        return
+    try:
+        schedule = _read_schedule()
+        schedule["jobs"].append({
+            "id": f"{time.time_ns()}-{os.getpid()}",
+            "name": name,
+            "run_at": time.time() + delay_seconds,
+            "args": command_args,
+            "cwd": os.getcwd(),
+        })
+        daemon_lock_fd = _claim_schedule_daemon_lock()
+        if daemon_lock_fd is None:
+            # A daemon is running, and the schedule's pid is the one it was started with
+            daemon_pid = schedule.get("pid")
+            _write_schedule(schedule)
+            try:
+                os.kill(daemon_pid, signal.SIGUSR1)
+            except (TypeError, OSError) as e:
+                print(f"Warning: Could not notify the scheduler daemon ({e}). The job will run when it next reads the schedule.")
+        else:
+            # No daemon: any pid left in the schedule is stale. The new daemon inherits the lock.
+            try:
+                # The child shouldn't inherit unsaved metadata or buffered output and write them twice
+                _flush_metadata()
+                sys.stdout.flush()
+                # Once the lock is released, another schedule-command may signal the new daemon before
+                # it has installed its handler, and SIGUSR1's default action would kill it. The child
+                # starts with the signal blocked and unblocks it once the handler is in place.
+                old_mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGUSR1})
+                daemon_pid = None
+                try:
+                    daemon_pid = os.fork()
+                finally:
+                    if daemon_pid != 0: # The parent, or a failed fork
+                        signal.pthread_sigmask(signal.SIG_SETMASK, old_mask)
+                if daemon_pid == 0:
+                    status = 1
+                    try:
+                        os.close(lock_fd) # Waits for the parent's lock at its first schedule read
+                        status = _run_schedule_daemon(daemon_lock_fd)
+                    except Exception:
+                        import traceback
+                        traceback.print_exc()
+                    finally:
+                        os._exit(status)
+            finally:
+                os.close(daemon_lock_fd) # The child's copy keeps the lock held
+            schedule["pid"] = daemon_pid
+            _write_schedule(schedule)
+    except OSError as e:
+        print(f"Error: Could not update the schedule file '{SCHEDULE_FILE}': {e}")
+        return
+    finally:
+        os.close(lock_fd)
+
+    print(f"Scheduled command '{' '.join(command_args)}' with name '{name}' to run in {delay_seconds:.2f} seconds.")
+    print(f"Scheduler daemon pid: {daemon_pid}. Output goes to '{SCHEDULE_LOG_FILE}'.")
 
 
 def undo_actions(steps):
@@ -1073,43 +2166,52 @@ def folder_mood_set(folder, mood, name):
     print(f"Mood '{mood}' ({name if name else 'No name'}) set for folder '{folder}'.")
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="SuperHelperXPro: Your smart file assistant that helps you sort, fix, and manage your files with simple commands!"
-    )
+# --- Command-line parsers ---
+# One builder per command, so main() only has to build the parser for the command being run.
 
-    subparsers = parser.add_subparsers(dest="command", required=True)
+def _str2bool(value):
+    """Parses a true/false command-line argument; 'true', '1' and 'yes' (any case) are true."""
+    return value.lower() in ("true", "1", "yes")
 
-    # visualize
+def _add_quiet_argument(command_parser):
+    """Adds --quiet to a command that prints a line per file."""
+    command_parser.add_argument("--quiet", action="store_true", help="Only print totals, not a line per file.")
+
+def _build_visualize_parser(subparsers):
     visualize_parser = subparsers.add_parser("visualize", help="See the folder tree.")
     visualize_parser.add_argument("folder", help="The folder to visualize.")
     visualize_parser.add_argument(
         "max_depth", type=int, nargs="?", default=1, help="Max depth for visualization (default: 1)."
     )
+    visualize_parser.set_defaults(func=lambda a: visualize_folder(a.folder, a.max_depth))
 
-    # file-activity-graph
+def _build_file_activity_graph_parser(subparsers):
     file_activity_parser = subparsers.add_parser("file-activity-graph", help="Visualize file activity over the last year.")
     file_activity_parser.add_argument("folder", help="The folder to analyze.")
+    file_activity_parser.set_defaults(func=lambda a: file_activity_graph(a.folder))
 
-    # batch-rename
+def _build_batch_rename_parser(subparsers):
     batch_rename_parser = subparsers.add_parser("batch-rename", help="Rename many files at once.")
     batch_rename_parser.add_argument("folder", help="The folder to perform renaming in.")
     batch_rename_parser.add_argument("regex", help="The regex pattern for renaming.")
     batch_rename_parser.add_argument("replacement", help="The replacement string.")
     batch_rename_parser.add_argument(
         "recursive",
-        type=lambda x: x.lower() == "true",
+        type=_str2bool,
         nargs="?",
         default=False,
         help="Whether to rename recursively (true/false). Default: false.",
     )
+    _add_quiet_argument(batch_rename_parser)
+    batch_rename_parser.set_defaults(func=lambda a: batch_rename(a.folder, a.regex, a.replacement, a.recursive, a.quiet))
 
-    # deep-clone
+def _build_deep_clone_parser(subparsers):
     deep_clone_parser = subparsers.add_parser("deep-clone", help="Copy a whole folder and contents.")
     deep_clone_parser.add_argument("src", help="Source folder.")
     deep_clone_parser.add_argument("dest", help="Destination folder.")
+    deep_clone_parser.set_defaults(func=lambda a: deep_clone(a.src, a.dest))
 
-    # conditional-move-copy
+def _build_conditional_move_copy_parser(subparsers):
     conditional_parser = subparsers.add_parser("conditional-move-copy", help="Move or copy files by rules.")
     conditional_parser.add_argument("src", help="Source folder.")
     conditional_parser.add_argument("dest", help="Destination folder.")
@@ -1122,8 +2224,9 @@ def main():
     conditional_parser.add_argument(
         "--copy", action="store_true", help="Perform a copy instead of a move."
     )
+    conditional_parser.set_defaults(func=lambda a: conditional_move_copy(a.src, a.dest, a.type, a.value, a.copy))
 
-    # auto-cleanup
+def _build_auto_cleanup_parser(subparsers):
     cleanup_parser = subparsers.add_parser("auto-cleanup", help="Delete old or unwanted files.")
     cleanup_parser.add_argument("folder", help="The folder to clean up.")
     cleanup_parser.add_argument(
@@ -1132,112 +2235,168 @@ def main():
         help="Cleanup criteria (ageDays, emptyFile).",
     )
     cleanup_parser.add_argument("value", nargs="?", help="Value for the criteria (e.g., 30 for ageDays).")
+    _add_quiet_argument(cleanup_parser)
+
+    def run_auto_cleanup(a):
+        # The value is optional only for emptyFile
+        if a.criteria == "ageDays" and a.value is None:
+            cleanup_parser.error("ageDays needs a value (the number of days).")
+        auto_cleanup(a.folder, a.criteria, a.value, a.quiet)
+    cleanup_parser.set_defaults(func=run_auto_cleanup)
 
-    # deduplicate
+def _build_deduplicate_parser(subparsers):
     deduplicate_parser = subparsers.add_parser("deduplicate", help="Find and remove duplicate files.")
     deduplicate_parser.add_argument("folder", help="The folder to deduplicate.")
     deduplicate_parser.add_argument(
         "--dry-run", action="store_true", help="Just find duplicates, don't delete them."
     )
+    deduplicate_parser.add_argument(
+        "--hash-algo",
+        choices=HASH_ALGORITHMS,
+        default=DEFAULT_HASH_ALGO,
+        help="Hash algorithm used to compare files (default: blake3, falls back to sha256 if not installed).",
+    )
+    _add_quiet_argument(deduplicate_parser)
+    deduplicate_parser.set_defaults(func=lambda a: deduplicate(a.folder, a.dry_run, a.hash_algo, a.quiet))
 
-    # tag-file
+def _build_tag_file_parser(subparsers):
     tag_parser = subparsers.add_parser("tag-file", help="Add or remove tags on files.")
     tag_parser.add_argument("file_path", help="The file or folder to tag.")
     tag_parser.add_argument("--add", default="", help="Comma-separated tags to add.")
     tag_parser.add_argument("--remove", default="", help="Comma-separated tags to remove.")
     tag_parser.add_argument("--recursive", action="store_true", help="Apply to all files in subfolders if a folder is specified.")
+    tag_parser.add_argument("--files", nargs="+", default=None, help="Only tag these files (paths relative to the folder) instead of scanning it.")
+    tag_parser.set_defaults(func=lambda a: tag_file(a.file_path, a.add, a.remove, a.recursive, a.files))
 
-    # search-tag
+def _build_search_tag_parser(subparsers):
     search_tag_parser = subparsers.add_parser("search-tag", help="Find files with a specific tag.")
     search_tag_parser.add_argument("folder", help="The folder to search in.")
     search_tag_parser.add_argument("tag", help="The tag to search for.")
+    _add_quiet_argument(search_tag_parser)
+    search_tag_parser.set_defaults(func=lambda a: search_tag(a.folder, a.tag, a.quiet))
 
-    # search-meta
+def _build_search_meta_parser(subparsers):
     search_meta_parser = subparsers.add_parser("search-meta", help="Find files by size, date, type, using extended metadata.")
     search_meta_parser.add_argument("folder", help="The folder to search in.")
     search_meta_parser.add_argument("json_query", help="JSON string for the query.")
+    _add_quiet_argument(search_meta_parser)
+    search_meta_parser.set_defaults(func=lambda a: search_meta(a.folder, a.json_query, a.quiet))
 
-    # exec-script
+def _build_exec_script_parser(subparsers):
     exec_script_parser = subparsers.add_parser("exec-script", help="Run custom scripts (e.g., Python, Node.js).")
     exec_script_parser.add_argument("script_path", help="Path to the script file.")
     exec_script_parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments to pass to the script.")
+    exec_script_parser.set_defaults(func=lambda a: exec_script(a.script_path, a.args))
 
-    # health-check
+def _build_health_check_parser(subparsers):
     health_check_parser = subparsers.add_parser("health-check", help="Check data consistency.")
     health_check_parser.add_argument("folder", help="The folder to check.")
+    health_check_parser.set_defaults(func=lambda a: health_check(a.folder))
 
-    # export-map
+def _build_export_map_parser(subparsers):
     export_map_parser = subparsers.add_parser("export-map", help="Create a JSON catalog of your files with basic metadata.")
     export_map_parser.add_argument("folder", help="The folder to map.")
     export_map_parser.add_argument("json_file", help="The output JSON file path.")
+    export_map_parser.add_argument(
+        "--stream", action="store_true", help="Write a flat JSON array with one record per file instead of one entry per folder."
+    )
+    export_map_parser.set_defaults(func=lambda a: export_map(a.folder, a.json_file, a.stream))
 
-    # apply-rules
+def _build_apply_rules_parser(subparsers):
     apply_rules_parser = subparsers.add_parser("apply-rules", help="Run automation rules (conceptual).")
     apply_rules_parser.add_argument("folder", help="The folder to apply rules to.")
+    apply_rules_parser.set_defaults(func=lambda a: apply_rules(a.folder))
 
-    # schedule-command
-    schedule_parser = subparsers.add_parser("schedule-command", help="Schedule a command to run later (conceptual).")
+def _build_schedule_command_parser(subparsers):
+    schedule_parser = subparsers.add_parser("schedule-command", help="Schedule a command to run later in a background daemon.")
     schedule_parser.add_argument("name", help="A name for the scheduled command.")
     schedule_parser.add_argument("delay_ms", type=int, help="Delay in milliseconds before execution.")
     schedule_parser.add_argument("command_args", nargs=argparse.REMAINDER, help="The command and its arguments to schedule.")
+    schedule_parser.set_defaults(func=lambda a: schedule_command(a.name, a.delay_ms, a.command_args))
 
-    # undo-actions
+def _build_undo_actions_parser(subparsers):
     undo_parser = subparsers.add_parser("undo-actions", help="Reverts last actions (conceptual).")
     undo_parser.add_argument("steps", type=int, nargs="?", default=1, help="Number of steps to undo (default: 1).")
+    undo_parser.set_defaults(func=lambda a: undo_actions(a.steps))
 
-    # folder-mood-set
+def _build_folder_mood_set_parser(subparsers):
     folder_mood_set_parser = subparsers.add_parser("folder-mood-set", help="Set an emotional label for a folder.")
     folder_mood_set_parser.add_argument("folder", help="The folder to set the mood for.")
     folder_mood_set_parser.add_argument("mood", help="The mood value (e.g., 'Happy', 'Work', 'Archived').")
     folder_mood_set_parser.add_argument("--name", help="An optional name for the mood.", default=None)
+    folder_mood_set_parser.set_defaults(func=lambda a: folder_mood_set(a.folder, a.mood, a.name))
 
-    # folder-mood-get
+def _build_folder_mood_get_parser(subparsers):
     folder_mood_get_parser = subparsers.add_parser("folder-mood-get", help="Get the emotional label for a folder or search by mood.")
     folder_mood_get_parser.add_argument("folder", help="The folder to check or start scanning from.")
     folder_mood_get_parser.add_argument("--recursive", action="store_true", help="Scan subfolders recursively.")
     folder_mood_get_parser.add_argument("--filter-mood", help="Filter folders by mood name or value (case-insensitive).", default=None)
+    _add_quiet_argument(folder_mood_get_parser)
+    folder_mood_get_parser.set_defaults(func=lambda a: folder_mood_get(a.folder, a.recursive, a.filter_mood, a.quiet))
+
+COMMANDS = {
+    "visualize": _build_visualize_parser,
+    "file-activity-graph": _build_file_activity_graph_parser,
+    "batch-rename": _build_batch_rename_parser,
+    "deep-clone": _build_deep_clone_parser,
+    "conditional-move-copy": _build_conditional_move_copy_parser,
+    "auto-cleanup": _build_auto_cleanup_parser,
+    "deduplicate": _build_deduplicate_parser,
+    "tag-file": _build_tag_file_parser,
+    "search-tag": _build_search_tag_parser,
+    "search-meta": _build_search_meta_parser,
+    "exec-script": _build_exec_script_parser,
+    "health-check": _build_health_check_parser,
+    "export-map": _build_export_map_parser,
+    "apply-rules": _build_apply_rules_parser,
+    "schedule-command": _build_schedule_command_parser,
+    "undo-actions": _build_undo_actions_parser,
+    "folder-mood-set": _build_folder_mood_set_parser,
+    "folder-mood-get": _build_folder_mood_get_parser,
+}
+
+
+def _run_without_parser(argv):
+    """
+    Runs the plain forms of exec-script, undo-actions and folder-mood-get straight away, since
+    building the parser is most of their cost when a pipeline calls them over and over.
+    Returns False if the arguments need argparse (options, -h, or anything it would reject).
+    """
+    if len(argv) >= 2 and argv[0] == "exec-script" and not argv[1].startswith("-") and "--" not in argv[2:]:
+        exec_script(argv[1], argv[2:])
+        return True
+    if argv == ["undo-actions"] or (len(argv) == 2 and argv[0] == "undo-actions" and argv[1].isdecimal()):
+        undo_actions(int(argv[1]) if len(argv) == 2 else 1)
+        return True
+    if len(argv) == 2 and argv[0] == "folder-mood-get" and not argv[1].startswith("-"):
+        folder_mood_get(argv[1])
+        return True
+    return False
 
-    args = parser.parse_args()
+def main():
+    if _run_without_parser(sys.argv[1:]):
+        return
+
+    parser = argparse.ArgumentParser(
+        description="SuperHelperXPro: Your smart file assistant that helps you sort, fix, and manage your files with simple commands!"
+    )
 
-    # Dispatch commands
-    if args.command == "visualize":
-        visualize_folder(args.folder, args.max_depth)
-    elif args.command == "file-activity-graph":
-        file_activity_graph(args.folder)
-    elif args.command == "batch-rename":
-        batch_rename(args.folder, args.regex, args.replacement, args.recursive)
-    elif args.command == "deep-clone":
-        deep_clone(args.src, args.dest)
-    elif args.command == "conditional-move-copy":
-        conditional_move_copy(args.src, args.dest, args.type, args.value, args.copy)
-    elif args.command == "auto-cleanup":
-        auto_cleanup(args.folder, args.criteria, args.value)
-    elif args.command == "deduplicate":
-        deduplicate(args.folder, args.dry_run)
-    elif args.command == "tag-file":
-        tag_file(args.file_path, args.add, args.remove, args.recursive)
-    elif args.command == "search-tag":
-        search_tag(args.folder, args.tag)
-    elif args.command == "search-meta":
-        search_meta(args.folder, args.json_query)
-    elif args.command == "exec-script":
-        exec_script(args.script_path, args.args)
-    elif args.command == "health-check":
-        health_check(args.folder)
-    elif args.command == "export-map":
-        export_map(args.folder, args.json_file)
-    elif args.command == "apply-rules":
-        apply_rules(args.folder)
-    elif args.command == "schedule-command":
-        schedule_command(args.name, args.delay_ms, args.command_args)
-    elif args.command == "undo-actions":
-        undo_actions(args.steps)
-    elif args.command == "folder-mood-set":
-        folder_mood_set(args.folder, args.mood, args.name)
-    elif args.command == "folder-mood-get":
-        folder_mood_get(args.folder, args.recursive, args.filter_mood)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Only the invoked command's parser is needed; build them all for help or an unknown command
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in COMMANDS:
+        COMMANDS[command](subparsers)
     else:
-        print("Unknown command.")
+        for build_parser in COMMANDS.values():
+            build_parser(subparsers)
+
+    args = parser.parse_args()
+    args.func(args) # Each command's parser sets the function that runs it
+
+    # Saved metadata is written here rather than left to atexit, so a failed write sets the exit status
+    if _flush_metadata():
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()